@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Execução em lote com fila de jobs em SQLite (sem broker).
+
+Vários processos, em uma ou mais máquinas, consomem a mesma fila em um
+arquivo SQLite (ex.: em um filesystem compartilhado). Cada job é reservado
+com um lease renovado por heartbeat; se o worker morre, o lease expira e o
+job volta para a fila. Os relatórios são gravados atomicamente em reports/.
+
+Uso:
+    python batch_worker.py enqueue [--db reports/jobs.db] "tópico 1" "tópico 2"
+    python batch_worker.py enqueue --file topicos.txt
+    python batch_worker.py work [--processes 4] [--provider-concurrency 8]
+                                [--lease 120] [--exit-when-empty]
+    python batch_worker.py status
+
+Prioridade: o escalonador de provedores (scheduler.py) vale só dentro de um
+processo, e estes workers não dividem vagas com o servidor nem entre si. A
+marcação BATCH só tem efeito no servidor; carga em lote que precisa conviver
+com jobs interativos deve ser enviada ao server.py com "priority": "batch".
+Aqui, --provider-concurrency limita as chamadas simultâneas a cada provedor
+somando todos os processos do comando (padrão: 8), dividindo esse total
+entre eles (mínimo de 1 por processo). Ao rodar vários comandos ou várias
+máquinas, some os limites de todos e deixe folga na cota para o tráfego
+interativo.
+
+Observação: o SQLite depende de locks do filesystem. Em NFS, garanta que
+o lock esteja habilitado (sem `nolock`); o journal padrão (não-WAL) é
+usado justamente por funcionar em filesystems compartilhados.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import logging
+
+import report_scope
+from logging_config import setup_logging
+from scheduler import BATCH, job_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = "reports/jobs.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_input TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker_id TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_expires_at);
+"""
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Abre (e inicializa, se preciso) o banco da fila.
+
+    Cada thread/processo deve usar a sua própria conexão.
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def enqueue(conn: sqlite3.Connection, topics: list) -> list:
+    """
+    Enfileira tópicos de pesquisa.
+
+    Returns:
+        list: Ids dos jobs criados
+    """
+    now = time.time()
+    ids = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for topic in topics:
+            cursor = conn.execute(
+                "INSERT INTO jobs (user_input, created_at) VALUES (?, ?)", (topic, now))
+            ids.append(cursor.lastrowid)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return ids
+
+
+def lease_job(conn: sqlite3.Connection, worker_id: str, lease_seconds: float,
+              max_attempts: int):
+    """
+    Reserva o próximo job disponível (novo ou com lease expirado).
+
+    Jobs expirados que já atingiram max_attempts são marcados como 'failed'.
+
+    Returns:
+        sqlite3.Row | None: Job reservado, ou None se a fila estiver vazia
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', worker_id = NULL, finished_at = ?, "
+            "error = COALESCE(error, 'lease expirado após o máximo de tentativas') "
+            "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+            (now, now, max_attempts))
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' "
+            "OR (status = 'running' AND lease_expires_at < ?) "
+            "ORDER BY id LIMIT 1", (now,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker_id = ?, lease_expires_at = ?, "
+            "attempts = attempts + 1 WHERE id = ?",
+            (worker_id, now + lease_seconds, row["id"]))
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        conn.execute("COMMIT")
+        return job
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def heartbeat(conn: sqlite3.Connection, job_id: int, worker_id: str,
+              lease_seconds: float) -> bool:
+    """
+    Renova o lease do job.
+
+    Returns:
+        bool: False se o lease foi perdido (expirou e outro worker assumiu)
+    """
+    cursor = conn.execute(
+        "UPDATE jobs SET lease_expires_at = ? "
+        "WHERE id = ? AND worker_id = ? AND status = 'running'",
+        (time.time() + lease_seconds, job_id, worker_id))
+    return cursor.rowcount == 1
+
+
+def complete_job(conn: sqlite3.Connection, job_id: int, worker_id: str,
+                 result: dict) -> bool:
+    """Marca o job como concluído, se o lease ainda for deste worker."""
+    cursor = conn.execute(
+        "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?, "
+        "lease_expires_at = NULL WHERE id = ? AND worker_id = ? AND status = 'running'",
+        (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker_id))
+    return cursor.rowcount == 1
+
+
+def fail_job(conn: sqlite3.Connection, job_id: int, worker_id: str, error: str,
+             max_attempts: int) -> bool:
+    """Devolve o job para a fila ou, sem tentativas restantes, marca como 'failed'."""
+    cursor = conn.execute(
+        "UPDATE jobs SET "
+        "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+        "finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END, "
+        "error = ?, worker_id = NULL, lease_expires_at = NULL "
+        "WHERE id = ? AND worker_id = ? AND status = 'running'",
+        (max_attempts, max_attempts, time.time(), error, job_id, worker_id))
+    return cursor.rowcount == 1
+
+
+def status_counts(conn: sqlite3.Connection) -> dict:
+    """Retorna a quantidade de jobs por status."""
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+    return {row["status"]: row["n"] for row in rows}
+
+
+class _Heartbeat:
+    """Thread que renova o lease de um job enquanto ele executa."""
+
+    def __init__(self, db_path: str, job_id: int, worker_id: str, lease_seconds: float):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat",
+                                        daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        conn = connect(self.db_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                try:
+                    if not heartbeat(conn, self.job_id, self.worker_id, self.lease_seconds):
+                        self.lost = True
+                        logger.warning("⚠️ Lease do job %s perdido", self.job_id)
+                        return
+                except sqlite3.OperationalError as e:
+                    # Banco ocupado: tentar de novo no próximo intervalo
+                    logger.warning("⚠️ Falha no heartbeat do job %s: %s", self.job_id, e)
+        finally:
+            conn.close()
+
+
+def work(db_path: str, lease_seconds: float = 120, max_attempts: int = 3,
+         poll_interval: float = 2.0, exit_when_empty: bool = False) -> int:
+    """
+    Loop de um worker: reserva, executa e finaliza jobs até a fila esvaziar.
+
+    Returns:
+        int: Quantidade de jobs processados por este worker
+    """
+    from graph import graph
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect(db_path)
+    processed = 0
+    logger.info("👷 Worker %s consumindo %s", worker_id, db_path)
+
+    while True:
+        job = lease_job(conn, worker_id, lease_seconds, max_attempts)
+        if job is None:
+            if exit_when_empty:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        job_id = job["id"]
+        # Um report_id por tentativa: a retentativa não herda orçamento de
+        # hedge, blobs ou tokens de uma tentativa anterior (mesmo de outro worker)
+        report_id = f"job{job_id}-{job['attempts']}"
+        logger.info("⚙️ Job %s (tentativa %s): %s", job_id, job["attempts"], job["user_input"])
+        with _Heartbeat(db_path, job_id, worker_id, lease_seconds) as beat:
+            try:
+                with job_context(report_id, tenant="batch", priority_class=BATCH):
+                    # report_id nos nomes: outro worker (ou um lease perdido
+                    # ainda em execução) pode gravar o mesmo assunto no mesmo segundo
+                    result = graph.invoke({"user_input": job["user_input"],
+                                           "report_id": report_id,
+                                           "report_name_suffix": report_id})
+                error = None
+            except Exception as e:
+                logger.error("❌ Job %s falhou: %s", job_id, e)
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                # Garante que blobs/prefetches de tentativas interrompidas não fiquem retidos
+                report_scope.release(report_id)
+
+        if beat.lost:
+            logger.warning("⚠️ Resultado do job %s descartado: lease perdido", job_id)
+        elif error is not None:
+            fail_job(conn, job_id, worker_id, error, max_attempts)
+        else:
+            complete_job(conn, job_id, worker_id, {
+                "report_paths": result.get("report_paths", {}),
+                "report_errors": result.get("report_errors", {}),
+                "token_usage": result.get("token_usage", {}),
+            })
+            processed += 1
+
+    conn.close()
+    logger.info("🏁 Worker %s finalizado: %s job(s)", worker_id, processed)
+    return processed
+
+
+def process_provider_concurrency(total: int, processes: int) -> int:
+    """
+    Divide o limite total de chamadas simultâneas por provedor entre os processos.
+
+    Returns:
+        int: Limite de cada processo (no mínimo 1)
+    """
+    return max(1, total // max(1, processes))
+
+
+def _worker_process(db_path: str, lease_seconds: float, max_attempts: int,
+                    poll_interval: float, exit_when_empty: bool):
+    setup_logging()
+    work(db_path, lease_seconds, max_attempts, poll_interval, exit_when_empty)
+
+
+def _read_topics(args) -> list:
+    topics = list(args.topics)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            topics += [line.strip() for line in f if line.strip()]
+    return topics
+
+
+def main():
+    """Função principal do worker em lote."""
+    parser = argparse.ArgumentParser(description="Fila de relatórios em lote (SQLite)")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Arquivo SQLite da fila")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Enfileira tópicos")
+    enqueue_parser.add_argument("topics", nargs="*")
+    enqueue_parser.add_argument("--file", help="Arquivo com um tópico por linha")
+
+    work_parser = commands.add_parser("work", help="Consome a fila")
+    work_parser.add_argument("--processes", type=int, default=1)
+    work_parser.add_argument("--provider-concurrency", type=int, default=8,
+                             help="Chamadas simultâneas a cada provedor, somando os processos")
+    work_parser.add_argument("--lease", type=float, default=120,
+                             help="Duração do lease em segundos")
+    work_parser.add_argument("--max-attempts", type=int, default=3)
+    work_parser.add_argument("--poll-interval", type=float, default=2.0)
+    work_parser.add_argument("--exit-when-empty", action="store_true")
+
+    commands.add_parser("status", help="Mostra a quantidade de jobs por status")
+
+    args = parser.parse_args()
+    setup_logging()
+    # Processo de longa duração: renderizar PDFs em subprocessos recicláveis
+    os.environ.setdefault("AGENT_RENDER_ISOLATION", "1")
+
+    if args.command == "enqueue":
+        topics = _read_topics(args)
+        if not topics:
+            print("❌ Erro: informe ao menos um tópico")
+            sys.exit(1)
+        ids = enqueue(connect(args.db), topics)
+        print(f"📥 {len(ids)} job(s) enfileirado(s) em {args.db}")
+
+    elif args.command == "status":
+        print(json.dumps(status_counts(connect(args.db)), indent=2))
+
+    elif args.command == "work":
+        # Herdado pelos processos (spawn) antes de o escalonador ser criado
+        per_process = process_provider_concurrency(args.provider_concurrency, args.processes)
+        os.environ["AGENT_OPENAI_CONCURRENCY"] = str(per_process)
+        os.environ["AGENT_TAVILY_CONCURRENCY"] = str(per_process)
+        # Só há jobs em lote nestes processos: nenhuma vaga fica reservada
+        os.environ["AGENT_INTERACTIVE_RESERVED"] = "0"
+        logger.info("🚦 %s processo(s) com %s chamada(s) simultânea(s) por provedor cada",
+                    args.processes, per_process)
+        options = (args.db, args.lease, args.max_attempts, args.poll_interval,
+                   args.exit_when_empty)
+        if args.processes <= 1:
+            work(*options)
+            return
+        # spawn: cada processo importa o grafo do zero, sem herdar threads
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_worker_process, args=options)
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark de vazão do worker em lote por número de processos.
+
+Enfileira os mesmos N tópicos em uma fila SQLite nova e roda
+`batch_worker.py work --processes P --exit-when-empty` para cada P, com os
+backends falsos. Mede:
+
+    - tempo total do comando (inclui subir os processos e importar o grafo)
+    - vazão em regime: jobs concluídos por segundo entre o primeiro e o
+      último job finalizado (sem o custo de inicialização)
+
+As chamadas falsas apenas dormem (como a espera pela OpenAI/Tavily), então
+a vazão escala com os processos enquanto houver CPU para o trabalho local do
+grafo; com poucos núcleos a escala deixa de ser linear mais cedo. O limite
+total de chamadas por provedor (--provider-concurrency do worker) é alto por
+padrão aqui, para medir a escala dos processos e não a da cota.
+
+Uso:
+    python benchmarks/bench_batch.py [--jobs 48] [--processes 1 2 4 8] [--latency 0.2]
+                                     [--provider-concurrency 32]
+"""
+
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _run(processes: int, jobs: int, provider_concurrency: int, env: dict) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "jobs.db")
+        worker = os.path.join(ROOT, "batch_worker.py")
+        subprocess.run([sys.executable, worker, "--db", db_path, "enqueue",
+                        *[f"tema {i}" for i in range(jobs)]],
+                       cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+        start = time.monotonic()
+        subprocess.run([sys.executable, worker, "--db", db_path, "work",
+                        "--processes", str(processes), "--exit-when-empty",
+                        "--provider-concurrency", str(provider_concurrency),
+                        "--poll-interval", "0.05"],
+                       cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        wall = time.monotonic() - start
+        conn = sqlite3.connect(db_path)
+        done, first, last = conn.execute(
+            "SELECT COUNT(*), MIN(finished_at), MAX(finished_at) FROM jobs "
+            "WHERE status = 'done'").fetchone()
+        conn.close()
+    steady = (done - 1) / (last - first) if done > 1 and last > first else 0.0
+    return {"processes": processes, "done": done, "wall": wall, "steady": steady}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de vazão do batch_worker")
+    parser.add_argument("--jobs", type=int, default=48)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Latência das chamadas falsas (s)")
+    parser.add_argument("--provider-concurrency", type=int, default=32,
+                        help="Limite total de chamadas por provedor, somando os processos")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "AGENT_FAKE_BACKENDS": "1",
+        "AGENT_FAKE_LATENCY": str(args.latency),
+        "AGENT_LOG_LEVEL": "WARNING",
+        "AGENT_RENDER_ISOLATION": "0",
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")])),
+    })
+
+    print(f"{args.jobs} jobs, latência falsa de {args.latency}s por chamada, "
+          f"{os.cpu_count()} CPU(s)")
+    print(f"{'processos':>9} {'concluídos':>10} {'total (s)':>10} {'jobs/s':>8} "
+          f"{'escala':>7}")
+    base = None
+    for processes in args.processes:
+        row = _run(processes, args.jobs, args.provider_concurrency, env)
+        base = base or row["steady"]
+        scale = row["steady"] / base if base else 0.0
+        print(f"{row['processes']:>9} {row['done']:>10} {row['wall']:>10.2f} "
+              f"{row['steady']:>8.2f} {scale:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
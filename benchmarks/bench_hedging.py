@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência de cauda: hedging e prefetch especulativo.
+
+Executa relatórios em sequência com os backends falsos, onde uma fração
+das chamadas ao Tavily é lenta (AGENT_FAKE_SLOW_PROBABILITY), e compara o
+p50/p95/máximo da latência por relatório em quatro variantes: sem nada,
+só hedging, só prefetch e ambos. O planejador falso inclui o user_input
+entre as queries (AGENT_FAKE_ECHO_QUERY=1) em todas as variantes, para que
+o prefetch possa ser consumido sem mudar o trabalho feito.
+
+Cada variante roda em um subprocesso novo (histórico de latência zerado).
+
+Uso:
+    python benchmarks/bench_hedging.py [--reports 200] [--slow-probability 0.03]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VARIANTS = {
+    "baseline": {"AGENT_HEDGING": "0", "AGENT_SPECULATIVE_PREFETCH": "0"},
+    "hedging": {"AGENT_HEDGING": "1", "AGENT_SPECULATIVE_PREFETCH": "0"},
+    "prefetch": {"AGENT_HEDGING": "0", "AGENT_SPECULATIVE_PREFETCH": "1"},
+    "both": {"AGENT_HEDGING": "1", "AGENT_SPECULATIVE_PREFETCH": "1"},
+}
+
+
+def _percentile(ordered: list, p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def _run_variant(variant: str, reports: int, seed: int) -> dict:
+    random.seed(seed)
+    from graph import graph
+    import hedging
+
+    issued = won = 0
+    release = hedging.release
+
+    def counting_release(report_id):
+        # Soma os hedges de cada relatório antes de o orçamento ser descartado
+        nonlocal issued, won
+        stats = hedging.stats(report_id)
+        issued += stats["issued"]
+        won += stats["won"]
+        release(report_id)
+
+    hedging.release = counting_release
+
+    latencies = []
+    for i in range(reports):
+        start = time.monotonic()
+        graph.invoke({"user_input": f"tema {i}", "report_formats": ["md"]})
+        latencies.append(time.monotonic() - start)
+    latencies.sort()
+    return {
+        "variant": variant,
+        "p50": round(_percentile(latencies, 50), 3),
+        "p95": round(_percentile(latencies, 95), 3),
+        "max": round(latencies[-1], 3),
+        "hedges_issued": issued,
+        "hedges_won": won,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de hedging e prefetch")
+    parser.add_argument("--reports", type=int, default=200,
+                        help="Relatórios por variante (com poucos, o p95 é ruidoso)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Latência base das chamadas falsas (s)")
+    parser.add_argument("--slow-probability", type=float, default=0.03,
+                        help="Fração de chamadas lentas ao Tavily")
+    parser.add_argument("--slow-latency", type=float, default=1.0,
+                        help="Latência das chamadas lentas (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--variant", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(_run_variant(args.variant, args.reports, args.seed)))
+        return
+
+    base_env = dict(os.environ)
+    base_env.update({
+        "AGENT_FAKE_BACKENDS": "1",
+        "AGENT_FAKE_LATENCY": str(args.latency),
+        "AGENT_FAKE_SLOW_PROBABILITY": str(args.slow_probability),
+        "AGENT_FAKE_SLOW_LATENCY": str(args.slow_latency),
+        "AGENT_FAKE_ECHO_QUERY": "1",
+        "AGENT_HEDGE_INITIAL_DELAY": str(args.latency * 4),
+        "AGENT_HEDGE_MIN_SAMPLES": "10",
+        "AGENT_LOG_LEVEL": "WARNING",
+        "AGENT_RENDER_ISOLATION": "0",
+    })
+
+    print(f"{args.reports} relatórios em sequência; {args.slow_probability:.0%} das chamadas "
+          f"ao Tavily com {args.slow_latency}s (base {args.latency}s)")
+    print(f"{'variante':<10} {'p50 (s)':>8} {'p95 (s)':>8} {'máx (s)':>8} {'hedges':>8} "
+          f"{'vencidos':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for variant, overrides in VARIANTS.items():
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--variant", variant,
+                 "--reports", str(args.reports), "--seed", str(args.seed)],
+                cwd=workdir, env=dict(base_env, **overrides), check=True,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+            row = json.loads(output.strip().splitlines()[-1])
+            print(f"{row['variant']:<10} {row['p50']:>8} {row['p95']:>8} {row['max']:>8} "
+                  f"{row['hedges_issued']:>8} {row['hedges_won']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark do overhead de logging nos threads do grafo.
+
+Compara o padrão anterior (logging.basicConfig síncrono + f-strings) com o
+atual (setup_logging: LazyQueueHandler/QueueListener + formatação lazy),
+em três cenários com vários threads emitindo ao mesmo tempo:
+
+    hot       mensagens curtas em INFO (habilitado), como nos loops dos nós
+    disabled  payload grande (repr do estado) em DEBUG com o nível em INFO
+    payload   payload grande em INFO (habilitado)
+
+Mede o tempo até os threads terminarem de logar (o custo pago pelo grafo) e
+o tempo total incluindo o esvaziamento da fila. Cada variante roda em um
+subprocesso, com a saída de log gravada em um arquivo temporário.
+
+Uso:
+    python benchmarks/bench_logging.py [--threads 8] [--calls 2000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("hot", "disabled", "payload")
+
+
+def _payload() -> dict:
+    # Aproxima o repr de um ReportState com resumos embutidos (~40 KB)
+    return {
+        "user_input": "impacto da IA generativa no mercado financeiro",
+        "queries": [f"query {i}" for i in range(5)],
+        "queries_results": [{"title": f"Resultado {i}", "url": f"https://example.com/{i}",
+                             "resume": "Resumo simulado do conteúdo. " * 70}
+                            for i in range(20)],
+    }
+
+
+def _emitter(variant: str, scenario: str, logger: logging.Logger, payload: dict):
+    # Cada função reproduz a chamada de log de uma das variantes
+    if variant == "eager":
+        if scenario == "hot":
+            return lambda i: logger.info(f"📄 Processando resultado {i}: {payload['user_input']}")
+        if scenario == "disabled":
+            return lambda i: logger.debug(f"📊 Resposta do LLM: {payload}")
+        return lambda i: logger.info(f"📤 Estado final: {payload}")
+    if scenario == "hot":
+        return lambda i: logger.info("📄 Processando resultado %s: %s", i, payload['user_input'])
+    if scenario == "disabled":
+        return lambda i: logger.debug("📊 Resposta do LLM: %s", payload)
+    return lambda i: logger.info("📤 Estado final: %s", payload)
+
+
+def _run_variant(variant: str, scenario: str, threads: int, calls: int) -> dict:
+    if variant == "eager":
+        logging.basicConfig(level=logging.INFO,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+        drain = lambda: None  # noqa: E731
+    else:
+        from logging_config import setup_logging, shutdown_logging
+        setup_logging(level="INFO")
+        drain = shutdown_logging
+
+    logger = logging.getLogger("bench")
+    emit = _emitter(variant, scenario, logger, _payload())
+
+    def worker():
+        for i in range(calls):
+            emit(i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    threads_done = time.perf_counter() - start
+    drain()
+    total = time.perf_counter() - start
+    return {"variant": variant, "scenario": scenario,
+            "threads_s": round(threads_done, 3), "total_s": round(total, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do overhead de logging")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=2000,
+                        help="Chamadas de log por thread")
+    parser.add_argument("--variant", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(_run_variant(args.variant, args.scenario, args.threads, args.calls)))
+        return
+
+    env = dict(os.environ, AGENT_LOG_SAMPLE_RATE="1.0")
+    print(f"{args.threads} threads x {args.calls} chamadas de log")
+    print(f"{'cenário':<10} {'variante':<8} {'threads (s)':>12} {'total (s)':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for scenario in SCENARIOS:
+            for variant in ("eager", "lazy"):
+                with open(os.path.join(workdir, f"{scenario}_{variant}.log"), "w") as log_file:
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--variant", variant,
+                         "--scenario", scenario, "--threads", str(args.threads),
+                         "--calls", str(args.calls)],
+                        env=env, check=True, stdout=subprocess.PIPE, stderr=log_file,
+                        text=True).stdout
+                row = json.loads(output.strip().splitlines()[-1])
+                print(f"{scenario:<10} {variant:<8} {row['threads_s']:>12} {row['total_s']:>10}")
+
+
+if __name__ == "__main__":
+    main()
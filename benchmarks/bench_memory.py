@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória: muitos relatórios concorrentes em um único processo.
+
+Compara o layout de estado atual (QueryResult compacto + blob_store +
+logging lazy) com uma reprodução do layout anterior (resumos dentro do
+ReportState e reprs do estado logados em f-strings). Cada
+variante roda em um subprocesso novo, com os backends falsos, e mede:
+
+    - pico de RSS acima do RSS após os imports
+    - RSS retido depois que todos os relatórios terminam
+
+Uso:
+    python benchmarks/bench_memory.py [--reports 32] [--response-chars 20000]
+                                      [--extract-chars 200000]
+"""
+
+import argparse
+import json
+import operator
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class _PeakRss:
+    """Amostra o RSS do processo em background e guarda o pico."""
+
+    def __init__(self, interval: float = 0.005):
+        from render_pool import current_rss_mb
+        self._rss = current_rss_mb
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def _baseline_graph():
+    """Reprodução do grafo anterior: resumos no estado e reprs logados eagerly."""
+    import logging
+    from typing import List
+
+    from langgraph.graph import START, END, StateGraph
+    from langgraph.types import Send
+    from pydantic import BaseModel
+    from typing_extensions import Annotated
+
+    from fake_backends import FakeChatModel, FakeTavilyClient
+    from pdf_generator import save_markdown_file
+    from prompt import build_final_response, build_queries, resume_search
+
+    logger = logging.getLogger("bench.baseline")
+    llm = FakeChatModel()
+    tavily_client = FakeTavilyClient()
+
+    class QueryResult(BaseModel):
+        title: str = None
+        url: str = None
+        resume: str = None
+
+    class ReportState(BaseModel):
+        user_input: str = None
+        final_response: str = None
+        queries: List[str] = []
+        queries_results: Annotated[List[QueryResult], operator.add]
+
+    class QueryList(BaseModel):
+        queries: List[str]
+
+    def build_first_queries(state: ReportState):
+        logger.info(f"📝 Estado recebido: {state}")
+        prompt = build_queries.format(user_input=state.user_input)
+        logger.info(f"📋 Prompt gerado: {prompt[:100]}...")
+        response = llm.with_structured_output(QueryList).invoke(prompt)
+        logger.info(f"📊 Resposta do LLM: {response}")
+        state.queries = response.queries
+        logger.info(f"📤 Estado final: {state}")
+        return state
+
+    def single_search(query: str):
+        results = tavily_client.search(query, max_results=1, include_raw_content=False)
+        query_results = []
+        for result in results["results"]:
+            url_extraction = tavily_client.extract(result["url"])
+            raw_content = url_extraction["results"][0]["raw_content"]
+            prompt = resume_search.format(user_input=query, search_results=raw_content)
+            llm_result = llm.invoke(prompt)
+            query_results += [QueryResult(title=result["title"], url=result["url"],
+                                          resume=llm_result.content)]
+        return {"queries_results": query_results}
+
+    def spawn_researchers(state: ReportState):
+        return [Send("single_search", query) for query in state.queries]
+
+    def final_writer(state: ReportState):
+        search_results = ""
+        references = ""
+        for i, result in enumerate(state.queries_results):
+            search_results += f"[{i+1}]\n\nTitle: {result.title}\nURL: {result.url}\n"
+            search_results += f"Content: {result.resume}\n================\n\n"
+            references += f"[{i+1}] - [{result.title}]({result.url})\n"
+        prompt = build_final_response.format(user_input=state.user_input,
+                                             search_results=search_results)
+        llm_result = llm.invoke(prompt)
+        final_response = llm_result.content + "\n\n References:\n" + references
+        save_markdown_file(final_response, f"{threading.get_ident()}_{time.time_ns()}.md")
+        return {"final_response": final_response}
+
+    builder = StateGraph(ReportState)
+    builder.add_node("build_first_queries", build_first_queries)
+    builder.add_node("single_search", single_search)
+    builder.add_node("final_writer", final_writer)
+    builder.add_edge(START, "build_first_queries")
+    builder.add_conditional_edges("build_first_queries", spawn_researchers, ["single_search"])
+    builder.add_edge("single_search", "final_writer")
+    builder.add_edge("final_writer", END)
+    return builder.compile()
+
+
+def _run_variant(variant: str, reports: int) -> dict:
+    import gc
+    import logging
+
+    from render_pool import current_rss_mb
+
+    if variant == "baseline":
+        # Como no código anterior: basicConfig síncrono em INFO
+        logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+        graph = _baseline_graph()
+        initial = [{"user_input": f"tema {i}"} for i in range(reports)]
+    else:
+        from graph import graph
+        import blob_store
+        initial = [{"user_input": f"tema {i}", "report_formats": ["md"]}
+                   for i in range(reports)]
+
+    gc.collect()
+    rss_before = current_rss_mb()
+    start = time.monotonic()
+    with _PeakRss() as peak, ThreadPoolExecutor(max_workers=reports) as pool:
+        results = list(pool.map(graph.invoke, initial))
+    elapsed = time.monotonic() - start
+    del results
+    gc.collect()
+
+    result = {
+        "variant": variant,
+        "reports": reports,
+        "rss_before_mb": round(rss_before, 1),
+        "peak_growth_mb": round(peak.peak - rss_before, 1),
+        "retained_mb": round(current_rss_mb() - rss_before, 1),
+        "seconds": round(elapsed, 2),
+    }
+    if variant == "current":
+        result["blobs_left"] = blob_store.stats()["blobs"]
+    return result
+
+
+def _child_env(args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "AGENT_FAKE_BACKENDS": "1",
+        "AGENT_FAKE_LATENCY": str(args.latency),
+        "AGENT_FAKE_RESPONSE_CHARS": str(args.response_chars),
+        "AGENT_FAKE_EXTRACT_CHARS": str(args.extract_chars),
+        "AGENT_LOG_LEVEL": "INFO",
+        # Sem limites de concorrência: as duas variantes com o mesmo paralelismo
+        "AGENT_OPENAI_CONCURRENCY": "100000",
+        "AGENT_TAVILY_CONCURRENCY": "100000",
+        "AGENT_JOB_CONCURRENCY": "100000",
+        "AGENT_HEDGING": "0",
+        "AGENT_SPECULATIVE_PREFETCH": "0",
+        "AGENT_RENDER_ISOLATION": "0",
+    })
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória do estado do grafo")
+    parser.add_argument("--reports", type=int, default=32,
+                        help="Relatórios executados concorrentemente")
+    parser.add_argument("--response-chars", type=int, default=20000,
+                        help="Tamanho de cada resposta do LLM falso")
+    parser.add_argument("--extract-chars", type=int, default=200000,
+                        help="Tamanho de cada conteúdo extraído")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--variant", choices=["baseline", "current"],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(_run_variant(args.variant, args.reports)))
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for variant in ("baseline", "current"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--variant", variant,
+                 "--reports", str(args.reports)],
+                cwd=workdir, env=_child_env(args), check=True,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+            rows.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{args.reports} relatórios concorrentes, respostas de {args.response_chars} "
+          f"caracteres, extrações de {args.extract_chars} caracteres")
+    print(f"{'variante':<10} {'pico (MB)':>10} {'retido (MB)':>12} {'tempo (s)':>10}")
+    for row in rows:
+        print(f"{row['variant']:<10} {row['peak_growth_mb']:>10} {row['retained_mb']:>12} "
+              f"{row['seconds']:>10}")
+    if "blobs_left" in rows[-1]:
+        print(f"blobs restantes no blob_store: {rows[-1]['blobs_left']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark do escalonador: latência interativa sob carga em lote saturante.
+
+Reproduz o caminho recomendado para carga mista: jobs interativos e em lote
+no mesmo processo (como no server.py), disputando as mesmas vagas de
+provedor do escalonador. Muitos jobs em lote ocupam as vagas desde o início
+e, com a fila já saturada, jobs interativos são executados em sequência.
+Variantes (cada uma em um subprocesso novo):
+
+    - sem carga: só os jobs interativos (referência)
+    - sem prioridade: os jobs em lote marcados como interativos (só WFQ)
+    - prioridade sem reserva: lote marcado como batch, mas podendo ocupar
+      todas as vagas (AGENT_INTERACTIVE_RESERVED=0)
+    - prioridade com reserva: lote marcado como batch, com 4 vagas
+      reservadas para a classe interativa (AGENT_INTERACTIVE_RESERVED=4)
+
+Na variante sem prioridade, a espera p95 inclui a dos jobs em lote, que
+também estão na classe interativa.
+
+Uso:
+    python benchmarks/bench_scheduler.py [--batch-jobs 40] [--interactive-jobs 20]
+                                         [--concurrency 8] [--latency 0.2]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VARIANTS = {
+    "idle": ("sem carga", {}),
+    "fifo": ("sem prioridade", {}),
+    "priority": ("sem reserva", {"AGENT_INTERACTIVE_RESERVED": "0"}),
+    "reserved": ("com reserva", {"AGENT_INTERACTIVE_RESERVED": "4"}),
+}
+
+
+def _percentile(ordered: list, p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def _run_variant(variant: str, batch_jobs: int, interactive_jobs: int) -> dict:
+    from graph import graph
+    from scheduler import BATCH, INTERACTIVE, get_scheduler, job_context
+
+    def run(job_id, priority_class, tenant, latencies):
+        start = time.monotonic()
+        with job_context(job_id, tenant=tenant, priority_class=priority_class):
+            graph.invoke({"user_input": job_id, "report_id": job_id,
+                          "report_formats": ["md"]})
+        latencies.append(time.monotonic() - start)
+
+    batch_latencies = []
+    batch_class = INTERACTIVE if variant == "fifo" else BATCH
+    threads = [threading.Thread(target=run, args=(f"lote {i}", batch_class, "lote",
+                                                  batch_latencies))
+               for i in range(batch_jobs if variant != "idle" else 0)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    # Esperar o lote saturar as vagas antes dos jobs interativos
+    time.sleep(0.5 if threads else 0)
+
+    interactive = []
+    for i in range(interactive_jobs):
+        run(f"interativo {i}", INTERACTIVE, "interativo", interactive)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    interactive.sort()
+    waits = get_scheduler().metrics().get(INTERACTIVE, {})
+    return {
+        "variant": variant,
+        "p50": round(_percentile(interactive, 50), 3),
+        "p95": round(_percentile(interactive, 95), 3),
+        "wait_p95_ms": waits.get("p95_ms", 0.0),
+        "batch_per_s": round(len(batch_latencies) / elapsed, 2) if batch_latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de prioridade do escalonador")
+    parser.add_argument("--batch-jobs", type=int, default=40)
+    parser.add_argument("--interactive-jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Vagas por provedor no escalonador")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Latência das chamadas falsas (s)")
+    parser.add_argument("--variant", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(_run_variant(args.variant, args.batch_jobs, args.interactive_jobs)))
+        return
+
+    env = dict(os.environ)
+    env.pop("AGENT_INTERACTIVE_RESERVED", None)
+    env.update({
+        "AGENT_FAKE_BACKENDS": "1",
+        "AGENT_FAKE_LATENCY": str(args.latency),
+        "AGENT_OPENAI_CONCURRENCY": str(args.concurrency),
+        "AGENT_TAVILY_CONCURRENCY": str(args.concurrency),
+        "AGENT_LOG_LEVEL": "WARNING",
+        "AGENT_RENDER_ISOLATION": "0",
+    })
+
+    print(f"{args.interactive_jobs} jobs interativos em sequência, {args.batch_jobs} jobs em "
+          f"lote concorrentes; {args.concurrency} vagas por provedor, {args.latency}s por chamada")
+    print(f"{'variante':<15} {'p50 (s)':>8} {'p95 (s)':>8} {'espera p95 (ms)':>16} "
+          f"{'lote/s':>7}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for variant, (label, overrides) in VARIANTS.items():
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--variant", variant,
+                 "--batch-jobs", str(args.batch_jobs),
+                 "--interactive-jobs", str(args.interactive_jobs)],
+                cwd=workdir, env=dict(env, **overrides), check=True,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+            row = json.loads(output.strip().splitlines()[-1])
+            print(f"{label:<15} {row['p50']:>8} {row['p95']:>8} {row['wait_p95_ms']:>16} "
+                  f"{row['batch_per_s']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Armazenamento fora do estado para conteúdos grandes (resumos, extrações).
+
+O ReportState guarda apenas o id de cada blob; o texto fica aqui, agrupado
+por relatório, e é liberado de uma vez com release() ao final da execução.
+O estado (e seus reprs em logs e snapshots do stream) fica pequeno; os
+bytes residentes dos resumos são os mesmos (ver benchmarks/bench_memory.py).
+"""
+
+import threading
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+_blobs = {}
+_lock = threading.Lock()
+
+
+def put_blob(report_id: str, content: str) -> str:
+    """
+    Armazena um conteúdo no escopo do relatório.
+
+    Args:
+        report_id (str): Id do relatório dono do conteúdo
+        content (str): Texto a ser armazenado
+
+    Returns:
+        str: Id do blob, para ser referenciado no estado
+    """
+    blob_id = uuid.uuid4().hex
+    with _lock:
+        _blobs.setdefault(report_id, {})[blob_id] = content
+    return blob_id
+
+
+def get_blob(report_id: str, blob_id: str) -> str:
+    """
+    Recupera um conteúdo armazenado.
+
+    Raises:
+        KeyError: Se o relatório ou o blob não existirem (ex.: já liberados)
+    """
+    with _lock:
+        return _blobs[report_id][blob_id]
+
+
+def release(report_id: str) -> int:
+    """
+    Libera todos os blobs de um relatório.
+
+    Returns:
+        int: Quantidade de blobs liberados
+    """
+    with _lock:
+        blobs = _blobs.pop(report_id, {})
+    if blobs:
+        logger.info("🧹 %s blob(s) liberados do relatório %s", len(blobs), report_id)
+    return len(blobs)
+
+
+def stats() -> dict:
+    """Retorna número de relatórios, blobs e caracteres armazenados."""
+    with _lock:
+        return {
+            "reports": len(_blobs),
+            "blobs": sum(len(blobs) for blobs in _blobs.values()),
+            "chars": sum(len(c) for blobs in _blobs.values() for c in blobs.values()),
+        }
@@ -0,0 +1,219 @@
+"""
+Backends falsos (offline) para LLM e Tavily.
+
+Permitem executar o grafo completo sem chaves de API nem acesso à rede,
+simulando latência configurável. Ativados em graph.py com a variável de
+ambiente AGENT_FAKE_BACKENDS=1.
+
+Variáveis de ambiente:
+    AGENT_FAKE_LATENCY (float): Latência base de cada chamada, em segundos (padrão: 0.05)
+    AGENT_FAKE_SLOW_PROBABILITY (float): Probabilidade de uma chamada lenta ao
+        Tavily, para simular cauda de latência (padrão: 0)
+    AGENT_FAKE_SLOW_LATENCY (float): Latência das chamadas lentas, em segundos (padrão: 2.0)
+    AGENT_FAKE_RESPONSE_CHARS (int): Tamanho mínimo das respostas do LLM, em
+        caracteres, para benchmarks de memória (padrão: 0, resposta curta)
+    AGENT_FAKE_EXTRACT_CHARS (int): Tamanho do conteúdo extraído pelo Tavily
+        (padrão: ~3 mil caracteres)
+    AGENT_FAKE_ECHO_QUERY (str): "1" faz a saída estruturada incluir o
+        próprio user_input como primeira query, simulando um planejador que
+        o mantém (exercita o prefetch especulativo) (padrão: "0")
+
+O uso de tokens reportado simula o cache de prompt da OpenAI: prefixos a
+partir de 1024 tokens, em blocos de 128, já vistos pelo mesmo modelo contam
+como input_token_details.cache_read (tokens aproximados por ~4 caracteres).
+"""
+
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+# Cache de prompt simulado (regras da OpenAI, com ~4 caracteres por token)
+_CACHE_MIN_CHARS = 1024 * 4
+_CACHE_STEP_CHARS = 128 * 4
+_CACHE_MAX_ENTRIES = 4096
+
+
+def _default_latency() -> float:
+    return float(os.getenv("AGENT_FAKE_LATENCY", "0.05"))
+
+
+def _simulate_latency(latency: float) -> None:
+    """Dorme a latência base ou, com a probabilidade configurada, a latência de cauda."""
+    slow_probability = float(os.getenv("AGENT_FAKE_SLOW_PROBABILITY", "0"))
+    if slow_probability and random.random() < slow_probability:
+        latency = float(os.getenv("AGENT_FAKE_SLOW_LATENCY", "2.0"))
+    time.sleep(latency)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Substituto de ChatOpenAI com a mesma interface usada pelos nós.
+
+    É um chat model LangChain de verdade: dentro do grafo, as respostas são
+    transmitidas token a token (stream_mode="messages"), como com a OpenAI.
+
+    Args:
+        latency (float): Latência simulada por chamada, em segundos
+        queries (list): Queries retornadas pela saída estruturada
+        response_chars (int): Tamanho mínimo das respostas, em caracteres
+        echo_input (bool): Incluir o user_input do prompt como primeira query
+    """
+
+    latency: float = Field(default_factory=_default_latency)
+    response_chars: int = Field(
+        default_factory=lambda: int(os.getenv("AGENT_FAKE_RESPONSE_CHARS", "0")))
+    echo_input: bool = Field(
+        default_factory=lambda: os.getenv("AGENT_FAKE_ECHO_QUERY", "0") == "1")
+    queries: List[str] = Field(default_factory=lambda: [
+        "panorama atual do tema",
+        "dados recentes e estatísticas",
+        "tendências e impactos futuros",
+    ])
+    _prefix_cache: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _cache_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _cached_chars(self, prompt: str) -> int:
+        """Registra os prefixos do prompt e retorna quantos caracteres já estavam em cache."""
+        digest = hashlib.sha1()
+        prefixes = []
+        for end in range(_CACHE_STEP_CHARS, len(prompt) + 1, _CACHE_STEP_CHARS):
+            digest.update(prompt[end - _CACHE_STEP_CHARS:end].encode())
+            if end >= _CACHE_MIN_CHARS:
+                prefixes.append((end, digest.hexdigest()))
+        cached = 0
+        with self._cache_lock:
+            for end, key in prefixes:
+                if key in self._prefix_cache:
+                    cached = end
+                    self._prefix_cache.move_to_end(key)
+                else:
+                    self._prefix_cache[key] = True
+            while len(self._prefix_cache) > _CACHE_MAX_ENTRIES:
+                self._prefix_cache.popitem(last=False)
+        return cached
+
+    def _usage_message(self, prompt: str, content: str) -> AIMessage:
+        return _message(prompt, content, self._cached_chars(prompt))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        prompt = _prompt_text(messages)
+        content = _content(prompt, self.response_chars)
+        message = self._usage_message(prompt, content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        prompt = _prompt_text(messages)
+        content = _content(prompt, self.response_chars)
+        for token in re.findall(r"\S+\s*", content):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        # Último chunk sem conteúdo, apenas com o uso de tokens
+        usage = self._usage_message(prompt, content).usage_metadata
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs):
+        def structured(prompt):
+            time.sleep(self.latency)
+            queries = list(self.queries)
+            user_input = re.search(r"<USER_INPUT>\s*(.*?)\s*</USER_INPUT>",
+                                   _prompt_text(prompt), re.S)
+            if self.echo_input and user_input:
+                queries.insert(0, user_input.group(1))
+            parsed = schema(queries=queries)
+            if not include_raw:
+                return parsed
+            raw = self._usage_message(_prompt_text(prompt), parsed.model_dump_json())
+            return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+        return RunnableLambda(structured)
+
+
+def _prompt_text(prompt) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    return "".join(str(getattr(message, "content", message)) for message in prompt)
+
+
+def _content(prompt: str, response_chars: int = 0) -> str:
+    content = (
+        "# Relatório de Teste\n\n"
+        "## Resumo Executivo\n"
+        f"Resposta simulada para um prompt de {len(prompt)} caracteres [1].\n"
+    )
+    if len(content) < response_chars:
+        content += _filler("Texto simulado de preenchimento. ", response_chars - len(content))
+    return content
+
+
+def _filler(sentence: str, chars: int) -> str:
+    return (sentence * (chars // len(sentence) + 1))[:chars]
+
+
+def _message(prompt: str, content: str, cached_chars: int = 0) -> AIMessage:
+    """Cria a resposta com usage_metadata aproximado (~4 caracteres por token)."""
+    input_tokens = len(prompt) // 4
+    output_tokens = len(content) // 4
+    return AIMessage(content=content, usage_metadata={
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "input_token_details": {"cache_read": cached_chars // 4},
+    })
+
+
+class FakeTavilyClient:
+    """
+    Substituto mínimo de TavilyClient (search + extract).
+
+    Args:
+        latency (float): Latência simulada por chamada, em segundos
+        extract_chars (int): Tamanho do conteúdo extraído, em caracteres
+    """
+
+    def __init__(self, latency: float = None, extract_chars: int = None):
+        self.latency = _default_latency() if latency is None else latency
+        if extract_chars is None:
+            extract_chars = int(os.getenv("AGENT_FAKE_EXTRACT_CHARS", "0"))
+        self.extract_chars = extract_chars
+
+    def search(self, query: str, max_results: int = 5, **kwargs) -> dict:
+        _simulate_latency(self.latency)
+        slug = "-".join(query.lower().split())[:60] or "consulta"
+        results = [
+            {"title": f"Resultado {i+1} para {query}",
+             "url": f"https://example.com/{slug}/{i+1}"}
+            for i in range(max_results)
+        ]
+        return {"query": query, "results": results}
+
+    def extract(self, urls, **kwargs) -> dict:
+        _simulate_latency(self.latency)
+        if isinstance(urls, str):
+            urls = [urls]
+        results = [
+            {"url": url, "raw_content": (_filler(f"Conteúdo simulado extraído de {url}. ",
+                                                 self.extract_chars)
+                                         if self.extract_chars
+                                         else f"Conteúdo simulado extraído de {url}. " * 50)}
+            for url in urls
+        ]
+        return {"results": results, "failed_results": []}
@@ -8,13 +8,24 @@ from prompt import *
 from dotenv import load_dotenv
 from tavily import TavilyClient
 import logging
+import os
+import sys
+import threading
+import uuid
 
 from datetime import datetime
 from pdf_generator import generate_report_files
+import blob_store
+import hedging
+import report_scope
+import token_usage
+from scheduler import get_scheduler
+from profiling import profile_node
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+from logging_config import setup_logging
+
+# Configurar logging (I/O em thread dedicada, ver logging_config.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -22,86 +33,162 @@ logger.info("🚀 Aplicação iniciada e variáveis de ambiente carregadas")
 
 # LLMs
 logger.info("🤖 Inicializando LLMs...")
-llm = ChatOpenAI(model_name="gpt-4o-mini")
-reasoning_llm = ChatOpenAI(model_name="o3-mini")
+USE_FAKE_BACKENDS = os.getenv("AGENT_FAKE_BACKENDS") == "1"
+if USE_FAKE_BACKENDS:
+    from fake_backends import FakeChatModel, FakeTavilyClient
+    logger.info("🧪 Usando backends falsos (AGENT_FAKE_BACKENDS=1)")
+    llm = FakeChatModel()
+    reasoning_llm = FakeChatModel()
+else:
+    llm = ChatOpenAI(model_name="gpt-4o-mini")
+    reasoning_llm = ChatOpenAI(model_name="o3-mini")
 logger.info("✅ LLMs inicializados com sucesso")
 
+# Cliente Tavily compartilhado entre buscas e execuções
+_tavily_client = None
+_tavily_lock = threading.Lock()
+
+
+def get_tavily_client():
+    """Retorna o cliente Tavily compartilhado, criando-o na primeira chamada."""
+    global _tavily_client
+    if _tavily_client is None:
+        with _tavily_lock:
+            if _tavily_client is None:
+                _tavily_client = FakeTavilyClient() if USE_FAKE_BACKENDS else TavilyClient()
+                logger.info("🌐 Cliente Tavily inicializado")
+    return _tavily_client
+
+
+def search_web(report_id: str, query: str) -> dict:
+    """Busca no Tavily com hedging (ver hedging.py); cada cópia ocupa uma vaga do escalonador."""
+    return hedging.hedged_call("search", report_id, get_tavily_client().search,
+                               query, provider="tavily", max_results=1,
+                               include_raw_content=False)
+
+
 # Nós
 
 
 def build_first_queries(state: ReportState) -> ReportState:
     logger.info("🔍 Iniciando build_first_queries...")
-    logger.info(f"📝 Estado recebido: {state}")
+
+    if not state.report_id:
+        state.report_id = uuid.uuid4().hex
+    logger.info("🆔 Relatório: %s", state.report_id)
 
     class QueryList(BaseModel):
         queries: List[str]
 
     user_input = state.user_input
-    logger.info(f"👤 Input do usuário: {user_input}")
+    logger.info("👤 Input do usuário: %s", user_input)
+
+    # Busca especulativa pelo próprio input enquanto o LLM gera as queries
+    if hedging.prefetch_enabled():
+        hedging.prefetch(state.report_id, user_input, search_web,
+                         state.report_id, user_input)
 
     prompt = build_queries.format(user_input=user_input)
-    logger.info(f"📋 Prompt gerado: {prompt[:100]}...")
+    logger.debug("📋 Prompt gerado: %.100s...", prompt)
 
-    query_llm = llm.with_structured_output(QueryList)
+    # include_raw mantém o AIMessage para contabilizar tokens (inclusive em cache)
+    query_llm = llm.with_structured_output(QueryList, include_raw=True)
     logger.info("🔄 Enviando prompt para LLM...")
 
-    response = query_llm.invoke(prompt)
-    logger.info(f"📊 Resposta do LLM: {response}")
+    output = get_scheduler().call("openai", query_llm.invoke, prompt)
+    token_usage.record_usage(state.report_id, "build_queries", output["raw"])
+    if output.get("parsing_error") is not None:
+        raise output["parsing_error"]
+    response = output["parsed"]
+    logger.debug("📊 Resposta do LLM: %s", response)
 
     state.queries = response.queries
-    logger.info(f"✅ Queries geradas: {state.queries}")
-    logger.info(f"📤 Estado final: {state}")
+    logger.info("✅ Queries geradas: %s", state.queries)
 
     return state
 
 
-def single_search(query: str):
-    logger.info(f"🔎 Iniciando busca para query: {query}")
-
-    tavily_client = TavilyClient()
-    logger.info("🌐 Cliente Tavily inicializado")
-
-    results = tavily_client.search(
-        query, max_results=1, include_raw_content=False)
+def single_search(task: dict):
+    query = task["query"]
+    report_id = task["report_id"]
+    logger.info("🔎 Iniciando busca para query: %s", query)
+
+    tavily_client = get_tavily_client()
+
+    prefetched = None
+    if task.get("prefetch_key") is not None:
+        prefetched = hedging.take_prefetched(report_id, task["prefetch_key"])
+    results = None
+    if prefetched is not None:
+        try:
+            results = prefetched.result()
+            logger.info("🔮 Usando resultado do prefetch especulativo")
+        except Exception as e:
+            # A busca especulativa é descartável: refazer a busca normalmente
+            logger.warning("⚠️ Prefetch especulativo falhou (%s); buscando novamente", e)
+    if results is None:
+        results = search_web(report_id, query)
     logger.info(
-        f"📋 Resultados da busca: {len(results.get('results', []))} resultado(s)")
+        "📋 Resultados da busca: %s resultado(s)", len(results.get('results', [])))
 
     query_results = []
     for i, result in enumerate(results["results"]):
-        logger.info(f"📄 Processando resultado {i+1}: {result['title']}")
+        logger.info("📄 Processando resultado %s: %s", i+1, result['title'])
         url = result["url"]
-        logger.info(f"🔗 URL: {url}")
+        logger.info("🔗 URL: %s", url)
 
-        url_extraction = tavily_client.extract(url)
+        url_extraction = hedging.hedged_call("extract", report_id, tavily_client.extract,
+                                             url, provider="tavily")
         if len(url_extraction["results"]) > 0:
             raw_content = url_extraction["results"][0]["raw_content"]
-            logger.info(f"📝 Conteúdo extraído: {len(raw_content)} caracteres")
+            logger.info("📝 Conteúdo extraído: %s caracteres", len(raw_content))
 
             prompt = resume_search.format(user_input=query,  # Corrigido: usar query em vez de user_input
                                           search_results=raw_content)
             logger.info("🤖 Enviando para LLM para resumo...")
 
-            llm_result = llm.invoke(prompt)
+            llm_result = get_scheduler().call("openai", llm.invoke, prompt)
+            token_usage.record_usage(report_id, "resume_search", llm_result)
             logger.info(
-                f"✅ Resumo gerado: {len(llm_result.content)} caracteres")
+                "✅ Resumo gerado: %s caracteres", len(llm_result.content))
 
-            query_results += [QueryResult(title=result["title"],
-                                          url=url,
-                                          resume=llm_result.content)]
+            resume_id = blob_store.put_blob(report_id, llm_result.content)
+            query_results.append(QueryResult(title=result["title"],
+                                             url=url,
+                                             resume_id=resume_id))
         else:
-            logger.warning(f"⚠️ Não foi possível extrair conteúdo de {url}")
+            logger.warning("⚠️ Não foi possível extrair conteúdo de %s", url)
 
-    logger.info(f"🎯 Total de resultados processados: {len(query_results)}")
+    logger.info("🎯 Total de resultados processados: %s", len(query_results))
     return {"queries_results": query_results}
 
 
+def _same_query(a: str, b: str) -> bool:
+    """Compara queries ignorando caixa e espaços extras."""
+    return " ".join(a.split()).casefold() == " ".join(b.split()).casefold()
+
+
 def spawn_researchers(state: ReportState):
     logger.info(
-        f"👥 Iniciando spawn_researchers com {len(state.queries)} queries")
-    logger.info(f"📋 Queries: {state.queries}")
+        "👥 Iniciando spawn_researchers com %s queries", len(state.queries))
+    logger.info("📋 Queries: %s", state.queries)
+
+    tasks = [{"query": query, "report_id": state.report_id} for query in state.queries]
+
+    # Aproveitar a busca especulativa feita em build_first_queries apenas se o
+    # LLM planejou a mesma query; caso contrário ela é descartada
+    if hedging.has_prefetch(state.report_id, state.user_input):
+        planned = [task for task in tasks if _same_query(task["query"], state.user_input)]
+        if planned:
+            planned[0]["prefetch_key"] = state.user_input
+        elif hedging.prefetch_extra_branch_enabled():
+            tasks.append({"query": state.user_input, "report_id": state.report_id,
+                          "prefetch_key": state.user_input})
+        else:
+            hedging.discard_prefetch(state.report_id, state.user_input)
 
-    sends = [Send("single_search", query) for query in state.queries]
-    logger.info(f"🚀 Criando {len(sends)} tarefas de busca paralela")
+    sends = [Send("single_search", task) for task in tasks]
+    logger.info("🚀 Criando %s tarefas de busca paralela", len(sends))
 
     return sends
 
@@ -109,50 +196,70 @@ def spawn_researchers(state: ReportState):
 def final_writer(state: ReportState):
     logger.info("✍️ Iniciando final_writer...")
     logger.info(
-        f"📊 Estado recebido: queries_results = {len(state.queries_results)} resultados")
+        "📊 Estado recebido: queries_results = %s resultados", len(state.queries_results))
 
-    search_results = ""
-    references = ""
+    search_parts = []
+    reference_parts = []
     for i, result in enumerate(state.queries_results):
-        logger.info(f"📄 Processando resultado {i+1}: {result.title}")
-        search_results += f"[{i+1}]\n\n"
-        search_results += f"Title: {result.title}\n"
-        search_results += f"URL: {result.url}\n"
-        search_results += f"Content: {result.resume}\n"
-        search_results += f"================\n\n"
+        logger.info("📄 Processando resultado %s: %s", i+1, result.title)
+        resume = blob_store.get_blob(state.report_id, result.resume_id)
+        search_parts.append(f"[{i+1}]\n\n"
+                            f"Title: {result.title}\n"
+                            f"URL: {result.url}\n"
+                            f"Content: {resume}\n"
+                            f"================\n\n")
+        reference_parts.append(f"[{i+1}] - [{result.title}]({result.url})\n")
 
-        references += f"[{i+1}] - [{result.title}]({result.url})\n"
+    search_results = "".join(search_parts)
+    references = "".join(reference_parts)
 
-    logger.info(f"📝 Conteúdo compilado: {len(search_results)} caracteres")
-    logger.info(f"🔗 Referências: {len(references)} caracteres")
+    logger.info("📝 Conteúdo compilado: %s caracteres", len(search_results))
+    logger.info("🔗 Referências: %s caracteres", len(references))
 
     prompt = build_final_response.format(user_input=state.user_input,  # Corrigido: usar state.user_input
                                          search_results=search_results)
     logger.info("🤖 Enviando para LLM de reasoning...")
 
-    llm_result = reasoning_llm.invoke(prompt)
+    llm_result = get_scheduler().call("openai", reasoning_llm.invoke, prompt)
+    token_usage.record_usage(state.report_id, "build_final_response", llm_result)
+    usage = token_usage.usage_summary(state.report_id)
+    # Os resumos já foram copiados para o prompt; liberar o escopo do relatório
+    report_scope.release(state.report_id)
     logger.info(
-        f"✅ Resposta final gerada: {len(llm_result.content)} caracteres")
+        "✅ Resposta final gerada: %s caracteres", len(llm_result.content))
 
     final_response = llm_result.content + "\n\n References:\n" + references
-    logger.info(f"📋 Resposta final completa: {len(final_response)} caracteres")
+    logger.info("📋 Resposta final completa: %s caracteres", len(final_response))
 
-    # Gerar PDF e Markdown usando o módulo dedicado
+    # Gerar os formatos pedidos (padrão: PDF + Markdown) usando o módulo dedicado
+    report_paths = {}
+    report_errors = {}
     try:
-        logger.info("📄 Gerando relatório profissional (PDF + Markdown)...")
+        logger.info("📄 Gerando relatório profissional (%s)...",
+                    ", ".join(state.report_formats))
         
         # Usar o módulo de geração de PDF com o user_input para nome do arquivo
-        report_files = generate_report_files(final_response, user_input=state.user_input)
-        
-        logger.info(f"✅ PDF profissional: {report_files['pdf_path']}")
-        logger.info(f"📝 Arquivo Markdown: {report_files['markdown_path']}")
+        report_files = generate_report_files(final_response, user_input=state.user_input,
+                                             formats=state.report_formats,
+                                             name_suffix=state.report_name_suffix)
         
+        report_paths = report_files['paths']
+        for fmt, error in report_files['errors'].items():
+            logger.error("❌ Formato %s não gerado: %s", fmt, error)
+            report_errors[fmt] = str(error)
+
     except Exception as e:
-        logger.error(f"❌ Erro ao gerar relatório: {str(e)}")
-        logger.error(f"🔍 Tipo do erro: {type(e).__name__}")
-        # Continuar execução mesmo se a geração falhar
+        logger.error("❌ Erro ao gerar relatório: %s", e)
+        logger.error("🔍 Tipo do erro: %s", type(e).__name__)
+        # Continuar execução mesmo se a geração falhar, registrando a causa
+        report_errors = {fmt: f"{type(e).__name__}: {e}" for fmt in state.report_formats}
 
-    return {"final_response": final_response}
+    logger.info("🧮 Tokens do relatório: %s de entrada (%s em cache), %s de saída",
+                usage["total"]["input_tokens"], usage["total"]["cached_input_tokens"],
+                usage["total"]["output_tokens"])
+
+    return {"final_response": final_response, "report_paths": report_paths,
+            "report_errors": report_errors, "token_usage": usage}
 
 
 # Criando o grafo de estados com nós e arestas
@@ -160,9 +267,9 @@ logger.info("🏗️ Construindo o grafo de estados...")
 builder = StateGraph(ReportState)
 
 logger.info("➕ Adicionando nós...")
-builder.add_node("build_first_queries", build_first_queries)
-builder.add_node("single_search", single_search)
-builder.add_node("final_writer", final_writer)
+builder.add_node("build_first_queries", profile_node("build_first_queries", build_first_queries))
+builder.add_node("single_search", profile_node("single_search", single_search))
+builder.add_node("final_writer", profile_node("final_writer", final_writer))
 
 logger.info("🔗 Adicionando arestas...")
 builder.add_edge(START, "build_first_queries")
@@ -178,24 +285,29 @@ logger.info("✅ Grafo compilado com sucesso")
 
 
 if __name__ == "__main__":
+    if "--profile" in sys.argv:
+        os.environ["AGENT_PROFILE"] = "1"
+
     logger.info("=" * 60)
     logger.info("🎯 INICIANDO EXECUÇÃO PRINCIPAL")
     logger.info("=" * 60)
 
     user_input = input(
         "💬 Por favor, insira o tópico para pesquisa e relatório: ")
-    logger.info(f"💬 Input do usuário: {user_input}")
+    logger.info("💬 Input do usuário: %s", user_input)
 
-    initial_state = {"user_input": user_input}
-    logger.info(f"🏁 Estado inicial: {initial_state}")
+    # report_id criado aqui: todos os nós da execução (inclusive o primeiro)
+    # gravam perfis e logs com o mesmo id
+    initial_state = {"user_input": user_input, "report_id": uuid.uuid4().hex}
+    logger.info("🏁 Estado inicial: %s", initial_state)
 
     try:
         logger.info("🚀 Invocando o grafo...")
         result = graph.invoke(initial_state)
-        logger.info(f"✅ Execução concluída com sucesso!")
-        logger.info(f"📊 Tipo do resultado: {type(result)}")
+        logger.info("✅ Execução concluída com sucesso!")
+        logger.info("📊 Tipo do resultado: %s", type(result))
         logger.info(
-            f"📋 Chaves do resultado: {result.keys() if isinstance(result, dict) else 'Não é dict'}")
+            "📋 Chaves do resultado: %s", result.keys() if isinstance(result, dict) else 'Não é dict')
 
         # O PDF e Markdown já foram gerados na função final_writer
         logger.info("✅ Execução concluída! Arquivos gerados:")
@@ -205,7 +317,7 @@ if __name__ == "__main__":
 
     except Exception as e:
         logger.error("=" * 60)
-        logger.error(f"❌ ERRO DURANTE A EXECUÇÃO: {str(e)}")
-        logger.error(f"🔍 Tipo do erro: {type(e).__name__}")
+        logger.error("❌ ERRO DURANTE A EXECUÇÃO: %s", e)
+        logger.error("🔍 Tipo do erro: %s", type(e).__name__)
         logger.error("=" * 60)
         raise
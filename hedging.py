@@ -0,0 +1,280 @@
+"""
+Requisições hedged e prefetch especulativo para chamadas ao Tavily.
+
+Hedging: se uma chamada passar do percentil configurado de latência
+observada para aquela operação, uma cópia é disparada e vence a primeira
+resposta bem-sucedida. Cada relatório tem um orçamento limitado de hedges.
+Com provider, cada cópia ocupa a sua própria vaga no escalonador
+(scheduler.py) até terminar, inclusive a perdedora; se não houver vaga livre
+na hora do hedge, a cópia não é disparada.
+
+Prefetch: permite iniciar uma busca antes de ela ser necessária (ex.: pelo
+user_input enquanto o LLM ainda gera as queries) e consumi-la depois. Os
+prefetches rodam em um pool próprio: a tarefa de prefetch chama
+hedged_call(), que espera por tarefas do pool de hedge, e não pode ocupar
+os threads desse mesmo pool.
+
+Variáveis de ambiente:
+    AGENT_HEDGING (str): "0" desativa o hedging (padrão: "1")
+    AGENT_HEDGE_PERCENTILE (float): Percentil de latência que dispara o hedge (padrão: 95)
+    AGENT_HEDGE_MIN_SAMPLES (int): Amostras antes de usar o percentil (padrão: 20)
+    AGENT_HEDGE_INITIAL_DELAY (float): Atraso do hedge sem amostras suficientes,
+        em segundos (padrão: 3.0)
+    AGENT_HEDGE_BUDGET (int): Máximo de hedges por relatório (padrão: 3)
+    AGENT_SPECULATIVE_PREFETCH (str): "1" ativa o prefetch (padrão: "0")
+    AGENT_PREFETCH_EXTRA_BRANCH (str): "1" pesquisa o user_input como ramo
+        extra quando o LLM não o incluir nas queries; por padrão o prefetch
+        não usado é descartado (padrão: "0")
+    AGENT_HEDGE_MAX_THREADS (int): Threads do pool de hedge (padrão: 64)
+    AGENT_PREFETCH_MAX_THREADS (int): Threads do pool de prefetch (padrão: 8)
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Pool de hedge: só executa chamadas-folha (fn de hedged_call), que nunca
+# esperam por outras tarefas do pool
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("AGENT_HEDGE_MAX_THREADS", "64")),
+                               thread_name_prefix="hedge")
+_prefetch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_PREFETCH_MAX_THREADS", "8")),
+    thread_name_prefix="prefetch")
+_in_hedge_pool = threading.local()
+_lock = threading.Lock()
+_trackers = {}
+_budgets = {}
+_prefetched = {}
+
+
+def hedging_enabled() -> bool:
+    return os.getenv("AGENT_HEDGING", "1") != "0"
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv("AGENT_SPECULATIVE_PREFETCH", "0") == "1"
+
+
+def prefetch_extra_branch_enabled() -> bool:
+    return os.getenv("AGENT_PREFETCH_EXTRA_BRANCH", "0") == "1"
+
+
+class LatencyTracker:
+    """
+    Janela deslizante de latências de uma operação.
+
+    Args:
+        window (int): Quantidade de amostras mantidas
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 1):
+        """Retorna o percentil p (0-100), ou None se houver menos de min_samples."""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+def get_tracker(operation: str) -> LatencyTracker:
+    with _lock:
+        if operation not in _trackers:
+            _trackers[operation] = LatencyTracker()
+        return _trackers[operation]
+
+
+def _hedge_delay(tracker: LatencyTracker) -> float:
+    delay = tracker.percentile(float(os.getenv("AGENT_HEDGE_PERCENTILE", "95")),
+                               int(os.getenv("AGENT_HEDGE_MIN_SAMPLES", "20")))
+    if delay is None:
+        delay = float(os.getenv("AGENT_HEDGE_INITIAL_DELAY", "3.0"))
+    return delay
+
+
+def _report_budget(report_id: str) -> dict:
+    # Chamado com _lock adquirido
+    if report_id not in _budgets:
+        _budgets[report_id] = {"remaining": int(os.getenv("AGENT_HEDGE_BUDGET", "3")),
+                               "issued": 0, "won": 0}
+    return _budgets[report_id]
+
+
+def _take_budget(report_id: str) -> bool:
+    with _lock:
+        budget = _report_budget(report_id)
+        if budget["remaining"] <= 0:
+            return False
+        budget["remaining"] -= 1
+        budget["issued"] += 1
+        return True
+
+
+def _record_win(report_id: str) -> None:
+    with _lock:
+        _report_budget(report_id)["won"] += 1
+
+
+def _submit(tracker: LatencyTracker, fn, args, kwargs, release=None):
+    # Cada submissão roda em uma cópia do contexto (logging por execução etc.)
+    context = contextvars.copy_context()
+
+    def timed():
+        _in_hedge_pool.active = True
+        try:
+            start = time.monotonic()
+            result = fn(*args, **kwargs)
+            tracker.record(time.monotonic() - start)
+            return result
+        finally:
+            # A vaga no escalonador é da cópia: só é devolvida quando ela termina
+            if release is not None:
+                release()
+
+    try:
+        return _executor.submit(context.run, timed)
+    except BaseException:
+        if release is not None:
+            release()
+        raise
+
+
+def hedged_call(operation: str, report_id: str, fn, *args, provider: str = None, **kwargs):
+    """
+    Executa fn com hedging baseado na latência observada da operação.
+
+    Args:
+        operation (str): Nome da operação (ex.: "search", "extract")
+        report_id (str): Relatório cujo orçamento de hedges será consumido
+        fn: Função a executar; deve ser idempotente
+        provider (str): Provedor no escalonador (ex.: "tavily"); cada cópia
+            ocupa uma vaga dele. Sem provider, nada é escalonado.
+
+    Returns:
+        O resultado da primeira execução bem-sucedida.
+
+    Raises:
+        Exception: O erro da última execução, se todas falharem
+    """
+    scheduler = get_scheduler() if provider is not None else None
+    # Dentro do pool de hedge, esperar por outra tarefa do pool pode travar
+    if not hedging_enabled() or getattr(_in_hedge_pool, "active", False):
+        if scheduler is None:
+            return fn(*args, **kwargs)
+        return scheduler.call(provider, fn, *args, **kwargs)
+
+    tracker = get_tracker(operation)
+    delay = _hedge_delay(tracker)
+    release = None
+    if scheduler is not None:
+        job = scheduler.acquire(provider)
+        release = functools.partial(scheduler.release, provider, job)
+    primary = _submit(tracker, fn, args, kwargs, release)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    release = None
+    if scheduler is not None:
+        job = scheduler.try_acquire(provider)
+        if job is None:
+            logger.info("🪂 Hedge de %s não disparado: sem vaga livre em %s",
+                        operation, provider)
+            return primary.result()
+        release = functools.partial(scheduler.release, provider, job)
+    if not _take_budget(report_id):
+        if release is not None:
+            release()
+        return primary.result()
+
+    logger.info("🪂 Hedge de %s disparado após %.2fs (relatório %s)",
+                operation, delay, report_id)
+    backup = _submit(tracker, fn, args, kwargs, release)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    _record_win(report_id)
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def prefetch(report_id: str, key: str, fn, *args, **kwargs) -> None:
+    """
+    Inicia fn em background (pool de prefetch) e guarda o futuro para
+    take_prefetched().
+
+    Args:
+        report_id (str): Relatório dono do resultado
+        key (str): Chave do resultado (ex.: a query buscada)
+    """
+    context = contextvars.copy_context()
+    future = _prefetch_executor.submit(context.run, fn, *args, **kwargs)
+    with _lock:
+        _prefetched[(report_id, key)] = future
+    logger.info("🔮 Prefetch especulativo iniciado: %s", key)
+
+
+def has_prefetch(report_id: str, key: str) -> bool:
+    with _lock:
+        return (report_id, key) in _prefetched
+
+
+def take_prefetched(report_id: str, key: str):
+    """Remove e retorna o futuro do prefetch, ou None se não houver."""
+    with _lock:
+        return _prefetched.pop((report_id, key), None)
+
+
+def discard_prefetch(report_id: str, key: str) -> bool:
+    """
+    Descarta um prefetch que não será usado, cancelando-o se ainda não começou.
+
+    Returns:
+        bool: True se havia um prefetch para a chave
+    """
+    future = take_prefetched(report_id, key)
+    if future is None:
+        return False
+    future.cancel()
+    logger.info("🔮 Prefetch especulativo descartado: %s", key)
+    return True
+
+
+def stats(report_id: str) -> dict:
+    """Retorna hedges disparados/vencedores e orçamento restante do relatório."""
+    with _lock:
+        budget = _budgets.get(report_id)
+        return dict(budget) if budget else {"remaining": None, "issued": 0, "won": 0}
+
+
+def release(report_id: str) -> None:
+    """Descarta orçamento e prefetches não consumidos do relatório."""
+    with _lock:
+        budget = _budgets.pop(report_id, None)
+        for key in [k for k in _prefetched if k[0] == report_id]:
+            _prefetched.pop(key).cancel()
+    if budget and budget["issued"]:
+        logger.info("🪂 Hedges do relatório %s: %s disparados, %s vencedores",
+                    report_id, budget["issued"], budget["won"])
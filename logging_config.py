@@ -0,0 +1,212 @@
+"""
+Configuração de logging de baixo overhead.
+
+Os handlers de I/O rodam em um QueueListener (thread dedicada); os threads
+do grafo apenas enfileiram o LogRecord, sem formatar a mensagem. Combinado
+com formatação lazy (`logger.info("... %s", valor)`), payloads grandes só
+são convertidos em string se o nível estiver habilitado e o registro
+passar pelos filtros de nível/amostragem.
+
+Nível por execução (run_logging): o logger raiz fica no menor nível exigido
+pelo global e pelas execuções ativas, e o SamplingFilter aplica a cada
+registro o nível da execução dele (ou o global). Enquanto uma execução em
+DEBUG estiver ativa, as demais criam LogRecords de DEBUG que são descartados
+no filtro, antes de qualquer formatação.
+
+Variáveis de ambiente:
+    AGENT_LOG_LEVEL (str): Nível global (padrão: INFO)
+    AGENT_LOG_SAMPLE_RATE (float): Fração de registros abaixo de WARNING
+        mantidos, entre 0 e 1 (padrão: 1.0)
+"""
+
+import atexit
+import contextvars
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_run_config = contextvars.ContextVar("agent_log_run_config", default=None)
+_listener = None
+_global_level = None
+_run_levels = Counter()
+_levels_lock = threading.Lock()
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não formata a mensagem no thread de origem.
+
+    O QueueHandler padrão chama format() em prepare(), o que traz de volta
+    para o thread do grafo o custo que a fila deveria remover. Aqui apenas
+    o traceback é materializado (exc_info não é seguro entre threads); msg e
+    args seguem intactos e são formatados pelo listener. Por isso os args
+    devem ser valores que não serão mutados depois do log (str, int, etc.).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Aplica o nível e a taxa de amostragem da execução corrente.
+
+    A configuração por execução (run_logging) tem precedência sobre a global;
+    sem nível da execução, vale o nível global de setup_logging. WARNING ou
+    acima nunca é amostrado.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level, sample_rate = _global_level or logging.NOTSET, self.sample_rate
+        config = _run_config.get()
+        if config is not None:
+            level = config.get("level", level)
+            sample_rate = config.get("sample_rate", sample_rate)
+        if record.levelno < level:
+            return False
+        if record.levelno < logging.WARNING and sample_rate < 1.0:
+            return random.random() < sample_rate
+        return True
+
+
+def _apply_root_level() -> None:
+    """Coloca o logger raiz no menor nível entre o global e as execuções ativas."""
+    with _levels_lock:
+        if _global_level is None:
+            return
+        level = min([_global_level, *_run_levels])
+        logging.getLogger().setLevel(level)
+
+
+def parse_level(level) -> int:
+    """
+    Converte um nível de log ("info", "DEBUG", 20...) para int.
+
+    Raises:
+        ValueError: Se o nível não for reconhecido
+    """
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Nível de log inválido: {level}")
+    return value
+
+
+def parse_sample_rate(sample_rate) -> float:
+    """
+    Valida uma taxa de amostragem de log (número entre 0 e 1).
+
+    Raises:
+        ValueError: Se a taxa não for numérica ou estiver fora de [0, 1]
+    """
+    if isinstance(sample_rate, str):
+        try:
+            sample_rate = float(sample_rate)
+        except ValueError:
+            raise ValueError(f"Taxa de amostragem inválida: {sample_rate}") from None
+    if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float)) \
+            or not 0 <= sample_rate <= 1:
+        raise ValueError(f"Taxa de amostragem inválida (use 0 a 1): {sample_rate}")
+    return float(sample_rate)
+
+
+def setup_logging(level=None, sample_rate: float = None) -> None:
+    """
+    Configura o logging raiz com QueueHandler + QueueListener.
+
+    Substitui logging.basicConfig; chamadas repetidas são ignoradas.
+
+    Args:
+        level (str | int): Nível global (padrão: AGENT_LOG_LEVEL ou INFO)
+        sample_rate (float): Amostragem global abaixo de WARNING
+            (padrão: AGENT_LOG_SAMPLE_RATE ou 1.0)
+    """
+    global _listener, _global_level
+    if _listener is not None:
+        return
+
+    if level is None:
+        level = os.getenv("AGENT_LOG_LEVEL", "INFO")
+    if sample_rate is None:
+        sample_rate = os.getenv("AGENT_LOG_SAMPLE_RATE", "1.0")
+    sample_rate = parse_sample_rate(sample_rate)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    _global_level = parse_level(level)
+    _apply_root_level()
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Esvazia a fila e encerra o listener (registrado em atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+@contextmanager
+def run_logging(level=None, sample_rate: float = None):
+    """
+    Define nível e amostragem de log apenas para a execução corrente.
+
+    O contexto é propagado para os threads do LangGraph via contextvars.
+    O nível por execução pode ser mais alto ou mais baixo que o global:
+    com level="DEBUG", só esta execução loga em DEBUG.
+
+    Exemplo:
+        >>> with run_logging(level="WARNING"):
+        ...     graph.invoke({"user_input": "..."})
+    """
+    config = {}
+    if level is not None:
+        config["level"] = parse_level(level)
+    if sample_rate is not None:
+        config["sample_rate"] = parse_sample_rate(sample_rate)
+    run_level = config.get("level")
+    if run_level is not None:
+        with _levels_lock:
+            _run_levels[run_level] += 1
+        _apply_root_level()
+    token = _run_config.set(config)
+    try:
+        yield
+    finally:
+        _run_config.reset(token)
+        if run_level is not None:
+            with _levels_lock:
+                _run_levels[run_level] -= 1
+                if not _run_levels[run_level]:
+                    del _run_levels[run_level]
+            _apply_root_level()
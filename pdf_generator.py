@@ -4,48 +4,45 @@ Utiliza WeasyPrint para conversão HTML->PDF com formatação profissional.
 """
 
 import markdown
-import weasyprint
 import os
+import tempfile
 from datetime import datetime
 import logging
 
+import render_pool
+
 logger = logging.getLogger(__name__)
 
 
-def create_pdf_from_markdown(markdown_content: str, filename: str) -> str:
+SUPPORTED_FORMATS = ("pdf", "html", "md")
+DEFAULT_FORMATS = ("pdf", "md")
+
+
+def render_html(markdown_content: str) -> str:
     """
-    Converte conteúdo Markdown para PDF usando WeasyPrint com formatação profissional.
+    Converte o relatório Markdown no documento HTML completo (com CSS).
+
+    É a etapa compartilhada por todos os formatos derivados de HTML (PDF e
+    HTML standalone); deve ser executada uma única vez por relatório.
 
     Args:
         markdown_content (str): Conteúdo em formato Markdown
-        filename (str): Nome do arquivo PDF a ser criado
 
     Returns:
-        str: Caminho completo do arquivo PDF gerado
-
-    Raises:
-        Exception: Se houver erro na geração do PDF
+        str: HTML completo do documento
     """
-    logger.info(f"🔧 Iniciando geração de PDF: {filename}")
-
-    # Criar diretório se não existir
-    os.makedirs('reports', exist_ok=True)
-    logger.info("📁 Diretório reports verificado/criado")
-
     # Converter Markdown para HTML
     md = markdown.Markdown(extensions=['extra', 'codehilite', 'toc'])
-    logger.info("🔄 Markdown processor inicializado")
 
     # CSS para formatação profissional
     css = _get_professional_css()
-    logger.info("🎨 CSS profissional carregado")
 
     # Separar conteúdo principal das referências
     content_parts = markdown_content.split(' References:')
     main_content = content_parts[0].strip()
     references = content_parts[1].strip() if len(content_parts) > 1 else ""
     logger.info(
-        f"📝 Conteúdo processado: {len(main_content)} chars principais, {len(references)} chars referências")
+        "📝 Conteúdo processado: %s chars principais, %s chars referências", len(main_content), len(references))
 
     # Converter conteúdo principal
     main_html = md.convert(main_content)
@@ -62,15 +59,76 @@ def create_pdf_from_markdown(markdown_content: str, filename: str) -> str:
     # HTML completo
     html_content = _build_complete_html(css, main_html, references_html)
     logger.info("📄 HTML completo montado")
+    return html_content
+
+
+def _write_pdf(html_content: str, pdf_path: str) -> None:
+    """Renderiza o HTML em PDF com WeasyPrint e grava atomicamente."""
+    if render_pool.isolation_enabled():
+        # Subprocesso reciclável: evita o acúmulo de memória do WeasyPrint
+        render_pool.get_pool().render(html_content, pdf_path)
+    else:
+        # Import tardio: exportações só HTML/MD não pagam o custo do WeasyPrint
+        import weasyprint
+        pdf_bytes = weasyprint.HTML(string=html_content).write_pdf()
+        _atomic_write(pdf_path, pdf_bytes)
+
+
+def create_pdf_from_markdown(markdown_content: str, filename: str) -> str:
+    """
+    Converte conteúdo Markdown para PDF usando WeasyPrint com formatação profissional.
+
+    Args:
+        markdown_content (str): Conteúdo em formato Markdown
+        filename (str): Nome do arquivo PDF a ser criado
+
+    Returns:
+        str: Caminho completo do arquivo PDF gerado
+
+    Raises:
+        Exception: Se houver erro na geração do PDF
+    """
+    logger.info("🔧 Iniciando geração de PDF: %s", filename)
+
+    # Criar diretório se não existir
+    os.makedirs('reports', exist_ok=True)
+
+    html_content = render_html(markdown_content)
 
     # Gerar PDF
     pdf_path = f"reports/{filename}"
     try:
-        weasyprint.HTML(string=html_content).write_pdf(pdf_path)
-        logger.info(f"✅ PDF gerado com sucesso: {pdf_path}")
+        _write_pdf(html_content, pdf_path)
+        logger.info("✅ PDF gerado com sucesso: %s", pdf_path)
         return pdf_path
     except Exception as e:
-        logger.error(f"❌ Erro ao gerar PDF com WeasyPrint: {str(e)}")
+        logger.error("❌ Erro ao gerar PDF com WeasyPrint: %s", e)
+        raise
+
+
+def save_html_file(html_content: str, filename: str) -> str:
+    """
+    Salva o documento HTML standalone (já renderizado por render_html).
+
+    Args:
+        html_content (str): HTML completo do documento
+        filename (str): Nome do arquivo HTML a ser criado
+
+    Returns:
+        str: Caminho completo do arquivo HTML salvo
+    """
+    logger.info("💾 Salvando arquivo HTML: %s", filename)
+
+    # Criar diretório se não existir
+    os.makedirs('reports', exist_ok=True)
+
+    html_path = f"reports/{filename}"
+    try:
+        _atomic_write(html_path, html_content.encode('utf-8'))
+        logger.info("✅ HTML salvo: %s", html_path)
+        return html_path
+    except Exception as e:
+        logger.error("❌ Erro ao salvar HTML: %s", e)
         raise
 
 
@@ -85,40 +143,93 @@ def save_markdown_file(markdown_content: str, filename: str) -> str:
     Returns:
         str: Caminho completo do arquivo Markdown salvo
     """
-    logger.info(f"💾 Salvando arquivo Markdown: {filename}")
+    logger.info("💾 Salvando arquivo Markdown: %s", filename)
 
     # Criar diretório se não existir
     os.makedirs('reports', exist_ok=True)
 
     markdown_path = f"reports/{filename}"
     try:
-        with open(markdown_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-        logger.info(f"✅ Markdown salvo: {markdown_path}")
+        _atomic_write(markdown_path, markdown_content.encode('utf-8'))
+        logger.info("✅ Markdown salvo: %s", markdown_path)
         return markdown_path
     except Exception as e:
-        logger.error(f"❌ Erro ao salvar Markdown: {str(e)}")
+        logger.error("❌ Erro ao salvar Markdown: %s", e)
+        raise
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """
+    Grava um arquivo de forma atômica (arquivo temporário + rename).
+
+    Leitores (outros workers, o servidor HTTP) nunca veem um arquivo parcial,
+    mesmo que o processo morra no meio da escrita.
+
+    Args:
+        path (str): Caminho final do arquivo
+        data (bytes): Conteúdo a ser gravado
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_',
+                                    suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp cria com 0600; manter a permissão usual de arquivos de relatório
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
         raise
 
 
-def generate_report_files(content: str, base_timestamp: str = None, user_input: str = None) -> dict:
+def generate_report_files(content: str, base_timestamp: str = None, user_input: str = None,
+                          formats=DEFAULT_FORMATS, name_suffix: str = None) -> dict:
     """
-    Gera ambos os arquivos PDF e Markdown com timestamp único e nome baseado no assunto.
+    Gera os arquivos do relatório nos formatos pedidos, com timestamp único e nome baseado no assunto.
+
+    O HTML é montado uma única vez e reaproveitado pelos formatos PDF e HTML.
+    Formatos baratos (Markdown, HTML) são gravados antes do PDF; se nem PDF
+    nem HTML forem pedidos, a conversão para HTML e o WeasyPrint são pulados.
 
     Args:
         content (str): Conteúdo do relatório em Markdown
         base_timestamp (str): Timestamp personalizado (opcional)
         user_input (str): Entrada do usuário para extrair o assunto (opcional)
+        formats (iterable): Formatos a gerar, entre "pdf", "html" e "md"
+            (padrão: PDF + Markdown)
+        name_suffix (str): Sufixo dos nomes dos arquivos (opcional), ex.: o
+            report_id, para que execuções concorrentes do mesmo assunto no
+            mesmo segundo não gravem o mesmo caminho
 
     Returns:
         dict: Dicionário com paths dos arquivos gerados
         {
-            'pdf_path': str,
-            'markdown_path': str,
+            'pdf_path': str | None,
+            'html_path': str | None,
+            'markdown_path': str | None,
+            'paths': {formato: path},
+            'errors': {formato: mensagem},
             'timestamp': str,
             'subject': str
         }
+
+    Raises:
+        ValueError: Se algum formato não for suportado
+        Exception: Se nenhum dos formatos pedidos puder ser gerado
     """
+    formats = set(formats)
+    unknown = formats - set(SUPPORTED_FORMATS)
+    if unknown:
+        raise ValueError(f"Formato(s) não suportado(s): {', '.join(sorted(unknown))}")
+    if not formats:
+        raise ValueError("Informe ao menos um formato")
+
     # Gerar timestamp se não fornecido
     if base_timestamp is None:
         base_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -126,36 +237,72 @@ def generate_report_files(content: str, base_timestamp: str = None, user_input:
     # Extrair assunto do conteúdo ou user_input
     subject = _extract_subject_from_content(content, user_input)
 
-    logger.info(f"📊 Gerando relatório completo - timestamp: {base_timestamp}")
-    logger.info(f"📋 Assunto identificado: {subject}")
-
-    # Nomes dos arquivos com assunto
-    pdf_filename = f"{subject}_{base_timestamp}.pdf"
-    markdown_filename = f"{subject}_{base_timestamp}.md"
-
-    try:
-        # Gerar PDF
-        pdf_path = create_pdf_from_markdown(content, pdf_filename)
-
-        # Salvar Markdown
-        markdown_path = save_markdown_file(content, markdown_filename)
-
-        result = {
-            'pdf_path': pdf_path,
-            'markdown_path': markdown_path,
-            'timestamp': base_timestamp,
-            'subject': subject
-        }
+    logger.info("📊 Gerando relatório (%s) - timestamp: %s",
+                ", ".join(fmt for fmt in SUPPORTED_FORMATS if fmt in formats), base_timestamp)
+    logger.info("📋 Assunto identificado: %s", subject)
+
+    base_name = f"{subject}_{base_timestamp}"
+    if name_suffix:
+        base_name += f"_{_sanitize_filename(name_suffix)}"
+    paths = {}
+    errors = {}
+
+    # Markdown primeiro: não depende do HTML nem do WeasyPrint
+    if "md" in formats:
+        try:
+            paths["md"] = save_markdown_file(content, f"{base_name}.md")
+        except Exception as e:
+            errors["md"] = f"{type(e).__name__}: {e}"
+
+    # HTML montado uma única vez, só se algum formato derivado for pedido
+    if formats & {"html", "pdf"}:
+        html_content = None
+        try:
+            html_content = render_html(content)
+        except Exception as e:
+            logger.error("❌ Erro ao montar o HTML: %s", e)
+            for fmt in formats & {"html", "pdf"}:
+                errors[fmt] = f"{type(e).__name__}: {e}"
+
+        if html_content is not None and "html" in formats:
+            try:
+                paths["html"] = save_html_file(html_content, f"{base_name}.html")
+            except Exception as e:
+                errors["html"] = f"{type(e).__name__}: {e}"
+
+        # PDF por último: é a etapa mais lenta e a mais sujeita a falhas
+        if html_content is not None and "pdf" in formats:
+            pdf_path = f"reports/{base_name}.pdf"
+            try:
+                os.makedirs('reports', exist_ok=True)
+                _write_pdf(html_content, pdf_path)
+                paths["pdf"] = pdf_path
+                logger.info("✅ PDF gerado com sucesso: %s", pdf_path)
+            except Exception as e:
+                logger.error("❌ Erro ao gerar PDF: %s", e)
+                errors["pdf"] = f"{type(e).__name__}: {e}"
+
+    if not paths:
+        raise Exception(f"Nenhum formato do relatório pôde ser gerado: {errors}")
+
+    result = {
+        'pdf_path': paths.get("pdf"),
+        'html_path': paths.get("html"),
+        'markdown_path': paths.get("md"),
+        'paths': paths,
+        'errors': errors,
+        'timestamp': base_timestamp,
+        'subject': subject
+    }
 
+    if errors:
+        logger.warning("⚠️ Relatório gerado parcialmente; falhas: %s", errors)
+    else:
         logger.info("🎯 Relatório completo gerado com sucesso!")
-        logger.info(f"📄 PDF: {pdf_path}")
-        logger.info(f"📝 Markdown: {markdown_path}")
-
-        return result
+    for fmt, path in paths.items():
+        logger.info("📄 %s: %s", fmt.upper(), path)
 
-    except Exception as e:
-        logger.error(f"❌ Erro ao gerar relatório completo: {str(e)}")
-        raise
+    return result
 
 
 def _extract_subject_from_content(content: str, user_input: str = None) -> str:
@@ -177,13 +324,13 @@ def _extract_subject_from_content(content: str, user_input: str = None) -> str:
         # Prioridade 1: Usar user_input se disponível
         if user_input and user_input.strip():
             subject = _sanitize_filename(user_input.strip())
-            logger.info(f"📝 Assunto extraído do user_input: {subject}")
+            logger.info("📝 Assunto extraído do user_input: %s", subject)
         else:
             # Prioridade 2: Extrair do título H1 do Markdown
             h1_match = re.search(r'^#\s+(.+?)$', content, re.MULTILINE)
             if h1_match:
                 subject = _sanitize_filename(h1_match.group(1).strip())
-                logger.info(f"📝 Assunto extraído do título H1: {subject}")
+                logger.info("📝 Assunto extraído do título H1: %s", subject)
             else:
                 # Prioridade 3: Usar as primeiras palavras significativas
                 lines = content.split('\n')
@@ -195,16 +342,16 @@ def _extract_subject_from_content(content: str, user_input: str = None) -> str:
                         if words:
                             subject = _sanitize_filename(' '.join(words))
                             logger.info(
-                                f"📝 Assunto extraído do conteúdo: {subject}")
+                                "📝 Assunto extraído do conteúdo: %s", subject)
                             break
 
         # Limitar tamanho do assunto
         if len(subject) > 50:
             subject = subject[:50]
-            logger.info(f"📝 Assunto truncado para: {subject}")
+            logger.info("📝 Assunto truncado para: %s", subject)
 
     except Exception as e:
-        logger.warning(f"⚠️ Erro ao extrair assunto, usando padrão: {str(e)}")
+        logger.warning("⚠️ Erro ao extrair assunto, usando padrão: %s", e)
         subject = "relatorio"
 
     return subject
@@ -448,12 +595,12 @@ def create_pdf_from_existing_markdown(markdown_file_path: str, output_pdf_name:
         'reports/relatorio_editado.pdf'
     """
     logger.info(
-        f"📄 Gerando PDF a partir do arquivo Markdown: {markdown_file_path}")
+        "📄 Gerando PDF a partir do arquivo Markdown: %s", markdown_file_path)
 
     # Verificar se o arquivo existe
     if not os.path.exists(markdown_file_path):
         error_msg = f"Arquivo Markdown não encontrado: {markdown_file_path}"
-        logger.error(f"❌ {error_msg}")
+        logger.error("❌ %s", error_msg)
         raise FileNotFoundError(error_msg)
 
     try:
@@ -462,7 +609,7 @@ def create_pdf_from_existing_markdown(markdown_file_path: str, output_pdf_name:
             markdown_content = f.read()
 
         logger.info(
-            f"✅ Conteúdo Markdown carregado: {len(markdown_content)} caracteres")
+            "✅ Conteúdo Markdown carregado: %s caracteres", len(markdown_content))
 
         # Determinar nome do PDF de saída
         if output_pdf_name is None:
@@ -475,14 +622,14 @@ def create_pdf_from_existing_markdown(markdown_file_path: str, output_pdf_name:
         if not output_pdf_name.endswith('.pdf'):
             output_pdf_name += '.pdf'
 
-        logger.info(f"🎯 Nome do PDF de saída: {output_pdf_name}")
+        logger.info("🎯 Nome do PDF de saída: %s", output_pdf_name)
 
         # Gerar o PDF usando a função existente
         pdf_path = create_pdf_from_markdown(markdown_content, output_pdf_name)
 
-        logger.info(f"🎉 PDF gerado com sucesso a partir do Markdown existente!")
-        logger.info(f"📄 Arquivo original: {markdown_file_path}")
-        logger.info(f"📄 PDF gerado: {pdf_path}")
+        logger.info("🎉 PDF gerado com sucesso a partir do Markdown existente!")
+        logger.info("📄 Arquivo original: %s", markdown_file_path)
+        logger.info("📄 PDF gerado: %s", pdf_path)
 
         return pdf_path
 
@@ -490,5 +637,5 @@ def create_pdf_from_existing_markdown(markdown_file_path: str, output_pdf_name:
         raise  # Re-raise FileNotFoundError
     except Exception as e:
         error_msg = f"Erro ao gerar PDF a partir do Markdown: {str(e)}"
-        logger.error(f"❌ {error_msg}")
+        logger.error("❌ %s", error_msg)
         raise Exception(error_msg)
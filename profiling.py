@@ -0,0 +1,179 @@
+"""
+Profiling opcional por nó do grafo.
+
+Quando ativado (AGENT_PROFILE=1 ou flag --profile), cada execução de nó
+registrada com profile_node() gera, em reports/profiles/<report_id>/:
+
+    <nó>_<n>.pstats      Estatísticas do cProfile (pstats / snakeviz)
+    <nó>_<n>.collapsed   Pilhas amostradas no formato "collapsed", pronto
+                         para flamegraph.pl ou speedscope
+
+Variáveis de ambiente:
+    AGENT_PROFILE (str): "1" ativa o profiling (padrão: desativado)
+    AGENT_PROFILE_INTERVAL (float): Intervalo de amostragem, em segundos (padrão: 0.005)
+    AGENT_PROFILE_DIR (str): Diretório base dos perfis (padrão: reports/profiles)
+
+As pilhas amostradas cobrem apenas o thread que executa o nó; trabalho
+disparado em outros pools (ex.: hedging) não aparece no .collapsed. Elas são
+a saída por nó confiável em qualquer versão.
+
+No Python 3.12+ o cProfile usa sys.monitoring e registra chamadas de todos os
+threads do processo, e só um pode estar ativo por vez. O .pstats é, então,
+do processo inteiro durante o nó (inclui os pools de hedge/prefetch) e só é
+gravado quando nenhum outro nó perfilado rodou ao mesmo tempo; em ramos
+paralelos (single_search) ou com vários jobs no servidor, os nós
+sobrepostos ficam apenas com o .collapsed. Antes do 3.12, o .pstats cobre só
+o thread do nó.
+"""
+
+import cProfile
+import functools
+import itertools
+import os
+import sys
+import threading
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+_sequence = itertools.count(1)
+
+# Python 3.12+: cProfile registra todos os threads do processo
+_PROCESS_WIDE_PROFILER = sys.version_info >= (3, 12)
+_active_lock = threading.Lock()
+_active = set()
+
+
+class _ActiveNode:
+    """Marca se outro nó perfilado rodou durante a execução deste."""
+
+    def __init__(self):
+        self.overlapped = False
+
+    def __enter__(self):
+        with _active_lock:
+            if _active:
+                self.overlapped = True
+                for node in _active:
+                    node.overlapped = True
+            _active.add(self)
+        return self
+
+    def __exit__(self, *exc):
+        with _active_lock:
+            _active.discard(self)
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("AGENT_PROFILE") == "1"
+
+
+class StackSampler:
+    """
+    Amostrador de pilhas de um único thread, executado em um thread auxiliar.
+
+    Args:
+        thread_id (int): Id do thread amostrado (threading.get_ident())
+        stop_frame: Frame onde a pilha é cortada (o wrapper do nó)
+        interval (float): Intervalo entre amostras, em segundos
+    """
+
+    def __init__(self, thread_id: int, stop_frame, interval: float):
+        self.thread_id = thread_id
+        self.stop_frame = stop_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler",
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.stop_frame:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                             f":{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _report_id_from(state) -> str:
+    if isinstance(state, dict):
+        report_id = state.get("report_id")
+    else:
+        report_id = getattr(state, "report_id", None)
+    return report_id or "sem_relatorio"
+
+
+def profile_node(name: str, fn):
+    """
+    Envolve um nó do grafo com profiling opcional.
+
+    A ativação é verificada a cada chamada, então AGENT_PROFILE pode ser
+    definido depois do grafo compilado (ex.: pela flag --profile).
+
+    Args:
+        name (str): Nome do nó (usado nos arquivos gerados)
+        fn: Função do nó
+
+    Returns:
+        Função com a mesma assinatura do nó
+    """
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        if not profiling_enabled():
+            return fn(state, *args, **kwargs)
+
+        profile_dir = os.path.join(os.getenv("AGENT_PROFILE_DIR", "reports/profiles"),
+                                   _report_id_from(state))
+        base_path = os.path.join(profile_dir, f"{name}_{next(_sequence)}")
+
+        sampler = StackSampler(threading.get_ident(), sys._getframe(),
+                               float(os.getenv("AGENT_PROFILE_INTERVAL", "0.005")))
+        profiler = cProfile.Profile()
+        active = _ActiveNode()
+        sampler.start()
+        with active:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+: só um cProfile ativo por processo (ramos paralelos)
+                profiler = None
+            try:
+                return fn(state, *args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                sampler.stop()
+                # Perfil do processo inteiro: só é do nó se ele rodou sozinho
+                if _PROCESS_WIDE_PROFILER and active.overlapped:
+                    profiler = None
+                try:
+                    os.makedirs(profile_dir, exist_ok=True)
+                    outputs = ".collapsed"
+                    if profiler is not None:
+                        profiler.dump_stats(base_path + ".pstats")
+                        outputs = ".{pstats,collapsed}"
+                    sampler.write_collapsed(base_path + ".collapsed")
+                    logger.info("🔬 Perfil do nó %s salvo em %s%s", name, base_path, outputs)
+                except OSError as e:
+                    logger.warning("⚠️ Não foi possível salvar o perfil de %s: %s", name, e)
+
+    return wrapper
@@ -1,25 +1,39 @@
+# Layout dos templates: instruções estáticas primeiro e partes variáveis
+# (user input, resultados de busca) sempre no final. Assim todas as chamadas
+# de um mesmo template compartilham um prefixo idêntico e o cache de prompt
+# do provedor (OpenAI) pode reaproveitá-lo entre requisições.
+
 agent_prompt = """
 You are a research planner.
 
 You are working on a project that aims to answer user's questions
-using sources found online. 
+using sources found online.
 
 Your answer MUST be technical, using up to date information.
 Cite facts, data and specific informations.
+"""
 
+_user_input_block = """
 Here's the user input
 <USER_INPUT>
 {user_input}
 </USER_INPUT>
 """
 
+_search_results_block = """
+Here's the web search results:
+<SEARCH_RESULTS>
+{search_results}
+</SEARCH_RESULTS>
+"""
+
 
 build_queries = agent_prompt + """
 Your first objective is to with build a list of queries
 that will be used to find answers to the user's question.
 
 Answer with anything between 3-5 queries.
-"""
+""" + _user_input_block
 
 resume_search = agent_prompt + """
 Your objective here is to analyze the web search results and make a synthesis of it,
@@ -28,12 +42,7 @@ emphasizing only what is relevant to the user's question.
 After your work, another agent will use the synthesis to build a final response to the user, so
 make sure the synthesis contains only useful information.
 Be concise and clear.
-
-Here's the web search results:
-<SEARCH_RESULTS>
-{search_results}
-</SEARCH_RESULTS>
-"""
+""" + _user_input_block + _search_results_block
 
 
 build_final_response = agent_prompt + """
@@ -56,7 +65,7 @@ IMPORTANT: Format your response in **Markdown** with the following structure:
 ### [Subtópico 1]
 [Conteúdo com citações [1], [2]]
 
-### [Subtópico 2] 
+### [Subtópico 2]
 [Conteúdo com citações [3], [4]]
 
 ### [Subtópico 3]
@@ -68,14 +77,9 @@ IMPORTANT: Format your response in **Markdown** with the following structure:
 ## Conclusões
 [Síntese final e considerações]
 
-Here's the web search results:
-<SEARCH_RESULTS>
-{search_results}
-</SEARCH_RESULTS>
-
-You must add reference citations (with the number of the citation, example: [1]) for the 
+You must add reference citations (with the number of the citation, example: [1]) for the
 articles you used in each paragraph of your answer.
 
-Remember: Use proper Markdown formatting with headers (##), subheaders (###), **bold text**, 
+Remember: Use proper Markdown formatting with headers (##), subheaders (###), **bold text**,
 *italic text*, lists, and links where appropriate.
-"""
+""" + _user_input_block + _search_results_block
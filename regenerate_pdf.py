@@ -14,12 +14,10 @@ import sys
 import os
 import logging
 from pdf_generator import create_pdf_from_existing_markdown
+from logging_config import setup_logging
 
 # Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -43,10 +41,10 @@ def main():
     try:
         logger.info(
             "🚀 Iniciando geração de PDF a partir de Markdown existente...")
-        logger.info(f"📄 Arquivo Markdown: {markdown_path}")
+        logger.info("📄 Arquivo Markdown: %s", markdown_path)
 
         if output_name:
-            logger.info(f"🎯 Nome do PDF de saída: {output_name}")
+            logger.info("🎯 Nome do PDF de saída: %s", output_name)
         else:
             logger.info("🎯 Usando nome automático para o PDF")
 
@@ -0,0 +1,238 @@
+"""
+Pool de subprocessos para renderização WeasyPrint (HTML -> PDF).
+
+Chamadas repetidas de weasyprint.HTML(...).write_pdf() acumulam memória em
+caches de fontes e layout. Em processos de longa duração (servidor, workers
+em lote) a renderização roda em subprocessos dedicados, reciclados após N
+jobs ou ao ultrapassarem um limite de RSS.
+
+Protocolo: o pai envia uma linha JSON {"html", "path"} no stdin do filho; o
+filho grava o PDF (atomicamente) e responde uma linha JSON {"ok", "rss_mb",
+"error"} no stdout.
+
+Variáveis de ambiente:
+    AGENT_RENDER_ISOLATION (str): "1" renderiza no pool (padrão: "0";
+        server.py e batch_worker.py ativam por padrão)
+    AGENT_RENDER_WORKERS (int): Subprocessos simultâneos (padrão: 2)
+    AGENT_RENDER_MAX_JOBS (int): Jobs por subprocesso antes de reciclar (padrão: 50)
+    AGENT_RENDER_MAX_RSS_MB (float): RSS que força a reciclagem (padrão: 500)
+    AGENT_RENDER_TIMEOUT (float): Tempo máximo por PDF, em segundos (padrão: 120)
+"""
+
+import atexit
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def isolation_enabled() -> bool:
+    return os.getenv("AGENT_RENDER_ISOLATION", "0") == "1"
+
+
+def current_rss_mb() -> float:
+    """RSS atual do processo em MB (Linux: /proc; demais: pico via getrusage)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta em bytes, Linux em KB
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RenderWorker:
+    """Um subprocesso de renderização e o número de jobs que já executou."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, encoding="utf-8", bufsize=1)
+        self.jobs = 0
+        self.rss_mb = 0.0
+        logger.info("🧵 Subprocesso de renderização iniciado (pid %s)", self.process.pid)
+
+    def render(self, html_content: str, pdf_path: str, timeout: float) -> None:
+        """
+        Renderiza um PDF no subprocesso.
+
+        Raises:
+            TimeoutError: Se o subprocesso não responder a tempo
+            RuntimeError: Se o subprocesso morrer ou a renderização falhar
+        """
+        request = json.dumps({"html": html_content, "path": os.path.abspath(pdf_path)})
+        try:
+            self.process.stdin.write(request + "\n")
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise RuntimeError("Subprocesso de renderização encerrado inesperadamente")
+
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            raise TimeoutError(f"Renderização excedeu {timeout}s")
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError("Subprocesso de renderização encerrado inesperadamente")
+
+        reply = json.loads(line)
+        self.jobs += 1
+        self.rss_mb = reply.get("rss_mb", 0.0)
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error") or "Erro desconhecido na renderização")
+
+    def close(self) -> None:
+        try:
+            if self.process.poll() is None:
+                try:
+                    self.process.stdin.close()
+                    self.process.wait(timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    self.process.kill()
+                    self.process.wait()
+        finally:
+            # Fechar os dois pipes mesmo se o filho já tiver morrido ou sido morto
+            for stream in (self.process.stdin, self.process.stdout):
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+
+class RenderPool:
+    """
+    Pool de RenderWorker com reciclagem por número de jobs e por RSS.
+
+    Args:
+        size (int): Quantidade máxima de subprocessos simultâneos
+        max_jobs (int): Jobs por subprocesso antes de reciclar
+        max_rss_mb (float): RSS (MB) do subprocesso que força a reciclagem
+        timeout (float): Tempo máximo por renderização, em segundos
+    """
+
+    def __init__(self, size: int = 2, max_jobs: int = 50, max_rss_mb: float = 500,
+                 timeout: float = 120):
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.timeout = timeout
+        self.recycled = 0
+        self.recycled_rss = 0
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.SimpleQueue()
+        self._workers = set()
+        self._lock = threading.Lock()
+
+    def render(self, html_content: str, pdf_path: str) -> None:
+        """Renderiza html_content em pdf_path usando um subprocesso do pool."""
+        with self._slots:
+            worker = self._acquire()
+            healthy = False
+            try:
+                worker.render(html_content, pdf_path, self.timeout)
+                healthy = True
+            except RuntimeError:
+                # Erro de renderização reportado pelo filho: o processo segue válido
+                healthy = worker.process.poll() is None
+                raise
+            finally:
+                self._release(worker, healthy)
+
+    def _acquire(self) -> RenderWorker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            worker = RenderWorker()
+            with self._lock:
+                self._workers.add(worker)
+            return worker
+
+    def _release(self, worker: RenderWorker, healthy: bool) -> None:
+        reason = None
+        over_rss = False
+        if not healthy:
+            reason = "falha"
+        elif worker.jobs >= self.max_jobs:
+            reason = f"{worker.jobs} jobs"
+        elif worker.rss_mb >= self.max_rss_mb:
+            reason = f"RSS {worker.rss_mb:.0f} MB"
+            over_rss = True
+
+        if reason is None:
+            self._idle.put(worker)
+            return
+
+        logger.info("♻️ Reciclando subprocesso de renderização (pid %s): %s",
+                    worker.process.pid, reason)
+        with self._lock:
+            self._workers.discard(worker)
+            self.recycled += 1
+            self.recycled_rss += over_rss
+        worker.close()
+
+    def close(self) -> None:
+        """Encerra todos os subprocessos."""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+def get_pool() -> RenderPool:
+    """Retorna o pool do processo, criado na primeira chamada a partir do ambiente."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RenderPool(
+                    size=int(os.getenv("AGENT_RENDER_WORKERS", "2")),
+                    max_jobs=int(os.getenv("AGENT_RENDER_MAX_JOBS", "50")),
+                    max_rss_mb=float(os.getenv("AGENT_RENDER_MAX_RSS_MB", "500")),
+                    timeout=float(os.getenv("AGENT_RENDER_TIMEOUT", "120")),
+                )
+                atexit.register(_pool.close)
+    return _pool
+
+
+def _serve() -> None:
+    """Loop do subprocesso: lê pedidos do stdin e responde no stdout."""
+    # O canal do protocolo é uma cópia do fd 1; o fd 1 passa a apontar para o
+    # stderr antes de importar o WeasyPrint, para que escritas de bibliotecas
+    # em C (Pango, fontconfig) no stdout não corrompam as respostas
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    sys.stdout.flush()
+    os.dup2(2, 1)
+
+    import weasyprint
+    from pdf_generator import _atomic_write
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            pdf_bytes = weasyprint.HTML(string=request["html"]).write_pdf()
+            _atomic_write(request["path"], pdf_bytes)
+            reply = {"ok": True}
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        reply["rss_mb"] = current_rss_mb()
+        protocol.write(json.dumps(reply) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    _serve()
@@ -0,0 +1,20 @@
+"""
+Liberação do escopo de um relatório.
+
+Blobs (blob_store), orçamento de hedge e prefetches (hedging) e uso de
+tokens (token_usage) ficam em registros do processo indexados pelo
+report_id. release() descarta os três de uma vez: é chamado ao final do
+final_writer e, para execuções interrompidas, por quem dispara o grafo
+(server.py, batch_worker.py).
+"""
+
+import blob_store
+import hedging
+import token_usage
+
+
+def release(report_id: str) -> None:
+    """Descarta blobs, hedges/prefetches e uso de tokens do relatório."""
+    blob_store.release(report_id)
+    hedging.release(report_id)
+    token_usage.release(report_id)
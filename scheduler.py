@@ -0,0 +1,304 @@
+"""
+Escalonador de chamadas a provedores (OpenAI, Tavily) com prioridade e justiça.
+
+Toda chamada a um provedor passa por ProviderScheduler.call(), que limita a
+concorrência por provedor e decide quem usa a próxima vaga:
+
+    1. Classe de prioridade: "interactive" sempre antes de "batch"
+    2. Dentro da classe, weighted fair queuing entre fluxos (tenant, ou o
+       job quando não há tenant), com peso configurável por job
+    3. Limite de chamadas simultâneas por job (evita que o fan-out de
+       spawn_researchers de um único job ocupe todas as vagas)
+    4. Vagas reservadas à classe "interactive" (opcional): jobs em lote
+       nunca ocupam todas as vagas do provedor, então uma chamada interativa
+       não espera uma chamada em lote terminar (não há preempção)
+
+O job corrente é definido com job_context() e propagado via contextvars
+para os threads do LangGraph. O escalonamento vale para o processo atual:
+processos diferentes (ex.: batch_worker.py) não dividem vagas entre si.
+
+Variáveis de ambiente:
+    AGENT_OPENAI_CONCURRENCY (int): Chamadas simultâneas à OpenAI (padrão: 8)
+    AGENT_TAVILY_CONCURRENCY (int): Chamadas simultâneas ao Tavily (padrão: 8)
+    AGENT_JOB_CONCURRENCY (int): Limite padrão de chamadas simultâneas por job (padrão: 4)
+    AGENT_INTERACTIVE_RESERVED (int): Vagas de cada provedor que jobs em lote
+        não podem usar, mesmo sem tráfego interativo; com capacidade 1 o lote
+        ainda usa a única vaga. Para manter a latência interativa sob carga em
+        lote, use o fan-out de um job (AGENT_JOB_CONCURRENCY) (padrão: 0)
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+import logging
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITY_CLASSES = {INTERACTIVE: 0, BATCH: 1}
+
+
+@dataclass(frozen=True)
+class JobContext:
+    """Identificação de um job para fins de escalonamento."""
+    job_id: str = None
+    tenant: str = None
+    priority_class: str = INTERACTIVE
+    weight: float = 1.0
+    max_concurrency: int = None
+
+    @property
+    def flow(self) -> str:
+        return self.tenant or self.job_id or "default"
+
+
+_DEFAULT_JOB = JobContext()
+_current_job = contextvars.ContextVar("agent_scheduler_job", default=_DEFAULT_JOB)
+
+
+@contextmanager
+def job_context(job_id: str, tenant: str = None, priority_class: str = INTERACTIVE,
+                weight: float = 1.0, max_concurrency: int = None):
+    """
+    Define o job corrente para as chamadas escalonadas dentro do bloco.
+
+    Raises:
+        ValueError: Se a classe de prioridade ou o peso forem inválidos
+
+    Exemplo:
+        >>> with job_context("job42", tenant="acme", priority_class=BATCH):
+        ...     graph.invoke({"user_input": "..."})
+    """
+    if priority_class not in PRIORITY_CLASSES:
+        raise ValueError(f"Classe de prioridade inválida: {priority_class}")
+    if weight <= 0:
+        raise ValueError("O peso deve ser positivo")
+    token = _current_job.set(JobContext(job_id, tenant, priority_class, weight,
+                                        max_concurrency))
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+class _Ticket:
+    __slots__ = ("job", "enqueued_at", "granted")
+
+    def __init__(self, job: JobContext):
+        self.job = job
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class ProviderScheduler:
+    """
+    Fila de prioridade com WFQ e limites por provedor e por job.
+
+    Args:
+        capacities (dict): Chamadas simultâneas por provedor, ex.: {"openai": 8}
+        job_concurrency (int): Limite padrão de chamadas simultâneas por job
+        metrics_window (int): Amostras de espera mantidas por classe
+        reserved_interactive (int): Vagas por provedor fora do alcance do lote
+    """
+
+    def __init__(self, capacities: dict, job_concurrency: int = 4,
+                 metrics_window: int = 1000, reserved_interactive: int = 0):
+        self.capacities = dict(capacities)
+        self.job_concurrency = job_concurrency
+        self.reserved_interactive = reserved_interactive
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self._waiting = defaultdict(list)         # provedor -> heap
+        self._in_flight = defaultdict(int)        # provedor -> chamadas
+        self._job_in_flight = defaultdict(int)    # (provedor, job) -> chamadas
+        self._class_in_flight = defaultdict(int)  # (provedor, classe) -> chamadas
+        self._virtual_time = defaultdict(float)   # (provedor, classe) -> tempo virtual
+        self._last_finish = {}                    # (provedor, classe, fluxo) -> tag
+        self._delays = defaultdict(lambda: deque(maxlen=metrics_window))
+
+    def call(self, provider: str, fn, *args, **kwargs):
+        """
+        Executa fn quando houver vaga para o job corrente no provedor.
+
+        Args:
+            provider (str): Nome do provedor (chave de capacities)
+            fn: Função que faz a chamada ao provedor
+        """
+        job = self.acquire(provider)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release(provider, job)
+
+    def acquire(self, provider: str) -> JobContext:
+        """
+        Espera uma vaga para o job corrente no provedor.
+
+        Returns:
+            JobContext: Job dono da vaga; devolva-a com release(provider, job)
+        """
+        job = _current_job.get()
+        ticket = _Ticket(job)
+        with self._cond:
+            self._enqueue(provider, ticket)
+            self._dispatch(provider)
+            try:
+                while not ticket.granted:
+                    self._cond.wait()
+            except BaseException:
+                # Interrompido na fila: devolver a vaga ou sair do heap
+                if ticket.granted:
+                    self._release(provider, job)
+                else:
+                    heap = self._waiting[provider]
+                    heap[:] = [entry for entry in heap if entry[-1] is not ticket]
+                    heapq.heapify(heap)
+                raise
+            self._delays[job.priority_class].append(time.monotonic() - ticket.enqueued_at)
+        return job
+
+    def try_acquire(self, provider: str):
+        """
+        Toma uma vaga para o job corrente só se ela estiver livre agora.
+
+        Não passa à frente de ninguém: com chamadas esperando na fila do
+        provedor, a vaga não é concedida. Usado para chamadas opcionais
+        (ex.: a cópia de um hedge).
+
+        Returns:
+            JobContext | None: Job dono da vaga, ou None se não houver vaga livre
+        """
+        job = _current_job.get()
+        with self._cond:
+            capacity = self.capacities.get(provider, 1)
+            if (self._waiting[provider] or self._in_flight[provider] >= capacity
+                    or self._at_job_cap(provider, job)
+                    or self._at_class_cap(provider, job, capacity)):
+                return None
+            self._grant(provider, job)
+        return job
+
+    def release(self, provider: str, job: JobContext) -> None:
+        """Devolve a vaga obtida com acquire() ou try_acquire()."""
+        with self._cond:
+            self._release(provider, job)
+
+    def _grant(self, provider: str, job: JobContext) -> None:
+        # Chamado com self._cond adquirido
+        self._in_flight[provider] += 1
+        self._class_in_flight[(provider, job.priority_class)] += 1
+        self._job_in_flight[(provider, job.job_id)] += 1
+
+    def _release(self, provider: str, job: JobContext) -> None:
+        # Chamado com self._cond adquirido
+        self._in_flight[provider] -= 1
+        self._class_in_flight[(provider, job.priority_class)] -= 1
+        self._job_in_flight[(provider, job.job_id)] -= 1
+        if not self._job_in_flight[(provider, job.job_id)]:
+            del self._job_in_flight[(provider, job.job_id)]
+        self._dispatch(provider)
+
+    def _enqueue(self, provider: str, ticket: _Ticket) -> None:
+        job = ticket.job
+        vkey = (provider, job.priority_class)
+        fkey = (provider, job.priority_class, job.flow)
+        start = max(self._virtual_time[vkey], self._last_finish.get(fkey, 0.0))
+        finish = start + 1.0 / job.weight
+        self._last_finish[fkey] = finish
+        heapq.heappush(self._waiting[provider],
+                       (PRIORITY_CLASSES[job.priority_class], finish, start,
+                        next(self._sequence), ticket))
+
+    def _at_job_cap(self, provider: str, job: JobContext) -> bool:
+        # Chamadas fora de job_context() não têm limite por job
+        if job.job_id is None:
+            return False
+        cap = job.max_concurrency or self.job_concurrency
+        return self._job_in_flight[(provider, job.job_id)] >= cap
+
+    def _at_class_cap(self, provider: str, job: JobContext, capacity: int) -> bool:
+        if job.priority_class == INTERACTIVE:
+            return False
+        cap = max(1, capacity - self.reserved_interactive)
+        return self._class_in_flight[(provider, job.priority_class)] >= cap
+
+    def _dispatch(self, provider: str) -> None:
+        # Chamado com self._cond adquirido
+        capacity = self.capacities.get(provider, 1)
+        heap = self._waiting[provider]
+        granted = False
+        skipped = []
+        while heap and self._in_flight[provider] < capacity:
+            entry = heapq.heappop(heap)
+            ticket = entry[-1]
+            job = ticket.job
+            if self._at_job_cap(provider, job) or self._at_class_cap(provider, job, capacity):
+                skipped.append(entry)
+                continue
+            self._grant(provider, job)
+            vkey = (provider, job.priority_class)
+            self._virtual_time[vkey] = max(self._virtual_time[vkey], entry[2])
+            ticket.granted = True
+            granted = True
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        if granted:
+            self._cond.notify_all()
+        if len(self._last_finish) > 10000:
+            self._prune_flows()
+
+    def _prune_flows(self) -> None:
+        # Fluxos cuja tag já ficou para trás do tempo virtual não afetam
+        # mais o escalonamento e podem ser esquecidos
+        for key, finish in list(self._last_finish.items()):
+            if finish <= self._virtual_time[(key[0], key[1])]:
+                del self._last_finish[key]
+
+    def metrics(self) -> dict:
+        """
+        Retorna o tempo de espera na fila por classe de prioridade.
+
+        Returns:
+            dict: {"interactive": {"count", "p50_ms", "p95_ms", "max_ms"}, ...}
+        """
+        with self._cond:
+            samples = {cls: sorted(delays) for cls, delays in self._delays.items()}
+        result = {}
+        for cls, delays in samples.items():
+            if not delays:
+                continue
+            p50 = delays[min(len(delays) - 1, int(0.50 * len(delays)))]
+            p95 = delays[min(len(delays) - 1, int(0.95 * len(delays)))]
+            result[cls] = {"count": len(delays),
+                           "p50_ms": round(p50 * 1000, 1),
+                           "p95_ms": round(p95 * 1000, 1),
+                           "max_ms": round(delays[-1] * 1000, 1)}
+        return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ProviderScheduler:
+    """Retorna o escalonador do processo, criado a partir do ambiente."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ProviderScheduler(
+                    capacities={
+                        "openai": int(os.getenv("AGENT_OPENAI_CONCURRENCY", "8")),
+                        "tavily": int(os.getenv("AGENT_TAVILY_CONCURRENCY", "8")),
+                    },
+                    job_concurrency=int(os.getenv("AGENT_JOB_CONCURRENCY", "4")),
+                    reserved_interactive=int(os.getenv("AGENT_INTERACTIVE_RESERVED", "0")),
+                )
+    return _scheduler
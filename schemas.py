@@ -1,17 +1,27 @@
 import operator
+from dataclasses import dataclass
 from typing_extensions import  Annotated
-from typing import List
+from typing import Dict, List
 
 from pydantic import BaseModel
 
 
-class QueryResult(BaseModel):
+@dataclass(frozen=True, slots=True)
+class QueryResult:
+    """Resultado de uma busca; o resumo fica no blob_store (resume_id)."""
     title: str = None
     url: str = None
-    resume: str = None
+    resume_id: str = None
+
 
 class ReportState(BaseModel):
+    report_id: str = None
     user_input: str = None
     final_response: str = None
     queries: List[str] = []
+    report_formats: List[str] = ["pdf", "md"]
+    report_name_suffix: str = None
+    report_paths: Dict[str, str] = {}
+    report_errors: Dict[str, str] = {}
+    token_usage: Dict[str, Dict[str, int]] = {}
     queries_results: Annotated[List[QueryResult], operator.add]
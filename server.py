@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local (asyncio) para o grafo de pesquisa.
+
+Expõe o grafo compilado em graph.py através de uma fila de jobs em memória,
+com limite de concorrência de workers e progresso via Server-Sent Events.
+
+Uso:
+    python server.py [--host 127.0.0.1] [--port 8000] [--workers 2] [--queue-size 32] [--profile]
+
+Endpoints:
+    POST /jobs                    {"user_input": "...", "priority"?, "tenant"?, "weight"?,
+                                   "log_level"?, "log_sample_rate"?, "formats"?}
+                                  -> 202 {"job_id": "..."}
+    GET  /jobs/<id>               Status do job
+    GET  /jobs/<id>/events        Progresso (nós e tokens) via SSE
+    GET  /jobs/<id>/report.md     Relatório final em Markdown
+    GET  /jobs/<id>/report.pdf    Relatório final em PDF
+    GET  /jobs/<id>/report.html   Relatório final em HTML standalone
+    GET  /health                  Estado da fila e dos workers
+
+Para rodar totalmente offline, use AGENT_FAKE_BACKENDS=1.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import report_scope
+from pdf_generator import DEFAULT_FORMATS, SUPPORTED_FORMATS
+from scheduler import INTERACTIVE, PRIORITY_CLASSES, get_scheduler, job_context
+from logging_config import parse_level, parse_sample_rate, run_logging, setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Status possíveis de um job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+_MAX_BODY_BYTES = 64 * 1024
+
+
+class Job:
+    """
+    Job de geração de relatório submetido ao servidor.
+
+    Args:
+        user_input (str): Tópico de pesquisa informado pelo cliente
+        priority (str): Classe de prioridade ("interactive" ou "batch")
+        tenant (str): Tenant para o fair queuing entre provedores (opcional)
+        weight (float): Peso do job no fair queuing (padrão: 1.0)
+        log_level (str): Nível de log apenas para esta execução (opcional)
+        log_sample_rate (float): Amostragem de log desta execução (opcional)
+        formats (list): Formatos do relatório, entre "pdf", "html" e "md"
+            (padrão: PDF + Markdown)
+    """
+
+    def __init__(self, user_input: str, priority: str = INTERACTIVE, tenant: str = None,
+                 weight: float = 1.0, log_level: str = None,
+                 log_sample_rate: float = None, formats: list = DEFAULT_FORMATS):
+        self.id = uuid.uuid4().hex
+        self.user_input = user_input
+        self.priority = priority
+        self.tenant = tenant
+        self.weight = weight
+        self.log_level = log_level
+        self.log_sample_rate = log_sample_rate
+        self.formats = list(formats)
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.final_response = None
+        self.report_paths = {}
+        self.report_errors = {}
+        self.token_usage = {}
+        self.error = None
+        self.events = []
+        self.subscribers = set()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "user_input": self.user_input,
+            "priority": self.priority,
+            "tenant": self.tenant,
+            "formats": self.formats,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "report_paths": self.report_paths,
+            "report_errors": self.report_errors,
+            "token_usage": self.token_usage,
+            "error": self.error,
+        }
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, ERROR)
+
+
+class ResearchServer:
+    """
+    Servidor HTTP que executa o grafo de pesquisa em uma fila de jobs limitada.
+
+    O grafo é síncrono, então cada execução roda em um thread pool com tamanho
+    igual ao número de workers; clientes LLM/Tavily são compartilhados entre
+    jobs pelo próprio módulo graph.
+
+    Args:
+        graph: Grafo compilado (objeto com método stream)
+        workers (int): Número máximo de jobs executando em paralelo
+        queue_size (int): Capacidade da fila de jobs pendentes
+        max_finished_jobs (int): Quantos jobs finalizados manter em memória
+    """
+
+    def __init__(self, graph, workers: int = 2, queue_size: int = 32,
+                 max_finished_jobs: int = 256):
+        self.graph = graph
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self._queue = None
+        self._loop = None
+        self._worker_tasks = []
+        self._executor = None
+        self._server = None
+        self._sequence = itertools.count()
+
+    # Ciclo de vida
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000):
+        """Inicia os workers e o socket HTTP. Retorna o asyncio.Server."""
+        self._loop = asyncio.get_running_loop()
+        # Jobs interativos saem da fila antes dos jobs em lote
+        self._queue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="graph-worker")
+        self._worker_tasks = [asyncio.create_task(self._worker(i))
+                              for i in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        sockname = self._server.sockets[0].getsockname()
+        logger.info("🌐 Servidor ouvindo em http://%s:%s (%s workers, fila=%s)",
+                    sockname[0], sockname[1], self.workers, self.queue_size)
+        return self._server
+
+    async def stop(self):
+        """Encerra o socket HTTP, os workers e o thread pool."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("🛑 Servidor encerrado")
+
+    # Fila de jobs
+
+    def submit(self, user_input: str, **job_options) -> Job:
+        """
+        Enfileira um novo job.
+
+        Raises:
+            asyncio.QueueFull: Se a fila de jobs estiver cheia
+        """
+        job = Job(user_input, **job_options)
+        self._queue.put_nowait((PRIORITY_CLASSES[job.priority], next(self._sequence), job))
+        self.jobs[job.id] = job
+        self._evict_finished_jobs()
+        logger.info("📥 Job %s enfileirado (%s/%s)", job.id, self._queue.qsize(), self.queue_size)
+        return job
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._publish(job, "status", {"status": RUNNING})
+                logger.info("⚙️ Worker %s executando job %s", index, job.id)
+                await self._loop.run_in_executor(self._executor, self._run_graph, job)
+                job.status = DONE
+            except Exception as e:
+                logger.error("❌ Job %s falhou: %s", job.id, e)
+                job.status = ERROR
+                job.error = f"{type(e).__name__}: {e}"
+            finally:
+                job.finished_at = time.time()
+                self._publish(job, "status", {"status": job.status, "error": job.error,
+                                              "report_paths": job.report_paths,
+                                              "report_errors": job.report_errors})
+                self._close_subscribers(job)
+                self._queue.task_done()
+
+    def _run_graph(self, job: Job):
+        """Executa o grafo em um thread do pool, publicando o progresso no loop."""
+        initial_state = {"user_input": job.user_input, "report_id": job.id,
+                         "report_formats": job.formats}
+        try:
+            with run_logging(level=job.log_level, sample_rate=job.log_sample_rate), \
+                    job_context(job.id, tenant=job.tenant, priority_class=job.priority,
+                                weight=job.weight):
+                self._stream_graph(job, initial_state)
+        finally:
+            # Garante que blobs/prefetches de execuções interrompidas não fiquem retidos
+            report_scope.release(job.id)
+
+    def _stream_graph(self, job: Job, initial_state: dict):
+        for mode, chunk in self.graph.stream(initial_state,
+                                             stream_mode=["updates", "messages"]):
+            if mode == "updates":
+                for node, update in (chunk or {}).items():
+                    if isinstance(update, dict):
+                        if update.get("final_response") is not None:
+                            job.final_response = update["final_response"]
+                        if update.get("report_paths"):
+                            job.report_paths = update["report_paths"]
+                        if update.get("report_errors"):
+                            job.report_errors = update["report_errors"]
+                        if update.get("token_usage"):
+                            job.token_usage = update["token_usage"]
+                    self._publish_threadsafe(job, "node", {"node": node})
+            elif mode == "messages":
+                message, metadata = chunk
+                token = getattr(message, "content", "")
+                if token:
+                    self._publish_threadsafe(job, "token", {
+                        "node": metadata.get("langgraph_node"),
+                        "token": token,
+                    })
+
+    def _evict_finished_jobs(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job.id]
+
+    # Eventos (SSE)
+
+    def _publish_threadsafe(self, job: Job, event: str, data: dict):
+        self._loop.call_soon_threadsafe(self._publish, job, event, data)
+
+    def _publish(self, job: Job, event: str, data: dict):
+        message = (event, data)
+        # Tokens são transmitidos apenas ao vivo; o restante fica para replay
+        if event != "token":
+            job.events.append(message)
+        for queue in job.subscribers:
+            queue.put_nowait(message)
+
+    def _close_subscribers(self, job: Job):
+        for queue in job.subscribers:
+            queue.put_nowait(None)
+
+    # HTTP
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, path, body = request
+            await self._route(method, path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            await self._send_json(writer, 400, {"error": str(e)})
+        except Exception as e:
+            logger.error("❌ Erro ao processar requisição: %s", e)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) < 2:
+            raise ValueError("Linha de requisição inválida")
+        method, path = parts[0].upper(), parts[1].split("?", 1)[0]
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", "0") or 0)
+        if length > _MAX_BODY_BYTES:
+            raise ValueError("Corpo da requisição muito grande")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, body
+
+    async def _route(self, method: str, path: str, body: bytes,
+                     writer: asyncio.StreamWriter):
+        segments = [s for s in path.split("/") if s]
+
+        if segments == ["health"]:
+            return await self._send_json(writer, 200, {
+                "queued": self._queue.qsize(),
+                "queue_size": self.queue_size,
+                "workers": self.workers,
+                "running": sum(1 for j in self.jobs.values() if j.status == RUNNING),
+                "provider_queue_delay": get_scheduler().metrics(),
+            })
+
+        if segments == ["jobs"]:
+            if method != "POST":
+                return await self._send_json(writer, 405, {"error": "Use POST"})
+            return await self._submit_job(body, writer)
+
+        if len(segments) < 2 or segments[0] != "jobs":
+            return await self._send_json(writer, 404, {"error": "Rota não encontrada"})
+
+        job = self.jobs.get(segments[1])
+        if job is None:
+            return await self._send_json(writer, 404, {"error": "Job não encontrado"})
+
+        if len(segments) == 2:
+            return await self._send_json(writer, 200, job.to_dict())
+        if segments[2:] == ["events"]:
+            return await self._stream_events(job, writer)
+        if segments[2:] == ["report.md"]:
+            return await self._send_report(job, "md", "text/markdown; charset=utf-8", writer)
+        if segments[2:] == ["report.pdf"]:
+            return await self._send_report(job, "pdf", "application/pdf", writer)
+        if segments[2:] == ["report.html"]:
+            return await self._send_report(job, "html", "text/html; charset=utf-8", writer)
+        return await self._send_json(writer, 404, {"error": "Rota não encontrada"})
+
+    async def _submit_job(self, body: bytes, writer: asyncio.StreamWriter):
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            raise ValueError("JSON inválido")
+        user_input = payload.get("user_input") if isinstance(payload, dict) else None
+        if not isinstance(user_input, str) or not user_input.strip():
+            raise ValueError("Campo 'user_input' é obrigatório")
+        priority = payload.get("priority", INTERACTIVE)
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Campo 'priority' deve ser um de: {', '.join(PRIORITY_CLASSES)}")
+        weight = payload.get("weight", 1.0)
+        if not isinstance(weight, (int, float)) or weight <= 0:
+            raise ValueError("Campo 'weight' deve ser um número positivo")
+        tenant = payload.get("tenant")
+        if tenant is not None and not isinstance(tenant, str):
+            raise ValueError("Campo 'tenant' deve ser texto")
+        log_level = payload.get("log_level")
+        if log_level is not None:
+            parse_level(log_level)
+        log_sample_rate = payload.get("log_sample_rate")
+        if log_sample_rate is not None:
+            if isinstance(log_sample_rate, str):
+                raise ValueError("Campo 'log_sample_rate' deve ser numérico")
+            log_sample_rate = parse_sample_rate(log_sample_rate)
+        formats = payload.get("formats", list(DEFAULT_FORMATS))
+        if (not isinstance(formats, list) or not formats
+                or any(fmt not in SUPPORTED_FORMATS for fmt in formats)):
+            raise ValueError(f"Campo 'formats' deve ser uma lista com: {', '.join(SUPPORTED_FORMATS)}")
+        try:
+            job = self.submit(user_input.strip(),
+                              priority=priority, tenant=tenant, weight=weight,
+                              log_level=log_level,
+                              log_sample_rate=log_sample_rate,
+                              formats=formats)
+        except asyncio.QueueFull:
+            return await self._send_json(writer, 503, {"error": "Fila de jobs cheia"})
+        return await self._send_json(writer, 202, {"job_id": job.id, "status": job.status})
+
+    async def _stream_events(self, job: Job, writer: asyncio.StreamWriter):
+        writer.write(self._headers(200, "text/event-stream", extra={
+            "Cache-Control": "no-cache",
+        }))
+        queue = asyncio.Queue()
+        history = list(job.events)
+        if not job.finished:
+            job.subscribers.add(queue)
+        try:
+            for event, data in history:
+                writer.write(_format_sse(event, data))
+            await writer.drain()
+            if job.finished:
+                return
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                writer.write(_format_sse(*message))
+                await writer.drain()
+        finally:
+            job.subscribers.discard(queue)
+
+    async def _send_report(self, job: Job, fmt: str, content_type: str,
+                           writer: asyncio.StreamWriter):
+        if not job.finished:
+            return await self._send_json(writer, 409, {"error": "Job ainda em execução",
+                                                       "status": job.status})
+        path = job.report_paths.get(fmt)
+        if not path or not os.path.exists(path):
+            return await self._send_json(writer, 404, {"error": f"Relatório {fmt} indisponível",
+                                                       "cause": job.report_errors.get(fmt)})
+        data = await self._loop.run_in_executor(None, _read_bytes, path)
+        writer.write(self._headers(200, content_type, len(data)))
+        writer.write(data)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(self._headers(status, "application/json; charset=utf-8", len(data)))
+        writer.write(data)
+        await writer.drain()
+
+    @staticmethod
+    def _headers(status: int, content_type: str, length: int = None,
+                 extra: dict = None) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 "Connection: close"]
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        for name, value in (extra or {}).items():
+            lines.append(f"{name}: {value}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _format_sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def _serve(args):
+    from graph import graph
+
+    server = ResearchServer(graph, workers=args.workers, queue_size=args.queue_size)
+    await server.start(args.host, args.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    """Função principal do servidor."""
+    parser = argparse.ArgumentParser(description="Servidor HTTP do agente de pesquisa")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Jobs executando em paralelo")
+    parser.add_argument("--queue-size", type=int, default=32,
+                        help="Capacidade da fila de jobs pendentes")
+    parser.add_argument("--profile", action="store_true",
+                        help="Gera perfis por nó em reports/profiles/ (AGENT_PROFILE=1)")
+    args = parser.parse_args()
+    # Processo de longa duração: renderizar PDFs em subprocessos recicláveis
+    os.environ.setdefault("AGENT_RENDER_ISOLATION", "1")
+    if args.profile:
+        os.environ["AGENT_PROFILE"] = "1"
+    setup_logging()
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Testes do worker em lote (batch_worker.py) com backends falsos.
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import json
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["AGENT_FAKE_BACKENDS"] = "1"
+os.environ.setdefault("AGENT_FAKE_LATENCY", "0.01")
+os.environ.setdefault("AGENT_LOG_LEVEL", "WARNING")
+
+import batch_worker  # noqa: E402
+import blob_store  # noqa: E402
+import graph  # noqa: E402
+import hedging  # noqa: E402
+import token_usage  # noqa: E402
+
+
+class BatchWorkerRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.workdir.name, "jobs.db")
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_retry_starts_with_clean_report_scope(self):
+        seen = []
+
+        def flaky_invoke(state):
+            # Primeira tentativa deixa blob, hedge e tokens para trás e falha
+            report_id = state["report_id"]
+            seen.append((report_id, hedging.stats(report_id)["issued"],
+                         blob_store.stats()["blobs"]))
+            if len(seen) == 1:
+                blob_store.put_blob(report_id, "resumo")
+                hedging._take_budget(report_id)
+                token_usage.record_usage(report_id, "resume_search", None)
+                raise RuntimeError("falha simulada")
+            return {"report_paths": {}, "token_usage": token_usage.usage_summary(report_id)}
+
+        conn = batch_worker.connect(self.db_path)
+        batch_worker.enqueue(conn, ["tema"])
+        with mock.patch.object(graph.graph, "invoke", flaky_invoke):
+            processed = batch_worker.work(self.db_path, max_attempts=2,
+                                          poll_interval=0.01, exit_when_empty=True)
+
+        self.assertEqual(processed, 1)
+        self.assertEqual(batch_worker.status_counts(conn), {"done": 1})
+        (first_id, _, _), (retry_id, retry_hedges, retry_blobs) = seen
+        self.assertNotEqual(first_id, retry_id)
+        self.assertEqual((retry_hedges, retry_blobs), (0, 0))
+        self.assertEqual(blob_store.stats()["blobs"], 0)
+        self.assertEqual(hedging.stats(first_id)["remaining"], None)
+        self.assertEqual(token_usage.usage_summary(first_id)["total"]["calls"], 0)
+        conn.close()
+
+
+class LeaseTest(unittest.TestCase):
+
+    LEASE = 0.05
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.conn = batch_worker.connect(os.path.join(self.workdir.name, "jobs.db"))
+        batch_worker.enqueue(self.conn, ["tema"])
+
+    def tearDown(self):
+        self.conn.close()
+        self.workdir.cleanup()
+
+    def _expire(self):
+        time.sleep(self.LEASE * 2)
+
+    def test_expired_lease_is_taken_by_another_worker(self):
+        first = batch_worker.lease_job(self.conn, "w1", self.LEASE, max_attempts=3)
+        self.assertIsNone(batch_worker.lease_job(self.conn, "w2", self.LEASE, max_attempts=3))
+        self._expire()
+        second = batch_worker.lease_job(self.conn, "w2", self.LEASE, max_attempts=3)
+
+        self.assertEqual(second["id"], first["id"])
+        self.assertEqual((second["worker_id"], second["attempts"]), ("w2", 2))
+        # O worker original perdeu o lease: não renova nem conclui o job
+        self.assertFalse(batch_worker.heartbeat(self.conn, first["id"], "w1", self.LEASE))
+        self.assertFalse(batch_worker.complete_job(self.conn, first["id"], "w1", {}))
+        self.assertFalse(batch_worker.fail_job(self.conn, first["id"], "w1", "erro", 3))
+        self.assertTrue(batch_worker.complete_job(self.conn, second["id"], "w2", {"ok": True}))
+        self.assertEqual(batch_worker.status_counts(self.conn), {"done": 1})
+
+    def test_expired_job_at_max_attempts_fails(self):
+        job = batch_worker.lease_job(self.conn, "w1", self.LEASE, max_attempts=1)
+        self.assertIsNotNone(job)
+        self._expire()
+        self.assertIsNone(batch_worker.lease_job(self.conn, "w2", self.LEASE, max_attempts=1))
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job["id"],)).fetchone()
+        self.assertEqual(row["status"], "failed")
+        self.assertIn("lease expirado", row["error"])
+        self.assertFalse(batch_worker.complete_job(self.conn, job["id"], "w1", {}))
+
+    def test_heartbeat_detects_lost_lease(self):
+        lease = 0.3
+        job = batch_worker.lease_job(self.conn, "w1", lease, max_attempts=3)
+        db_path = os.path.join(self.workdir.name, "jobs.db")
+        with batch_worker._Heartbeat(db_path, job["id"], "w1", lease) as beat:
+            # Lease expira (ex.: worker travado) e outro worker assume o job
+            self.conn.execute("UPDATE jobs SET lease_expires_at = 0 WHERE id = ?", (job["id"],))
+            batch_worker.lease_job(self.conn, "w2", lease, max_attempts=3)
+            time.sleep(lease)
+        self.assertTrue(beat.lost)
+
+
+class ReportNamesTest(unittest.TestCase):
+
+    def test_jobs_with_same_topic_write_distinct_files(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                conn = batch_worker.connect("jobs.db")
+                batch_worker.enqueue(conn, ["mesmo tema", "mesmo tema"])
+                batch_worker.work("jobs.db", poll_interval=0.01, exit_when_empty=True)
+                rows = conn.execute("SELECT id, result FROM jobs ORDER BY id").fetchall()
+                conn.close()
+            finally:
+                os.chdir(cwd)
+
+        paths = [json.loads(row["result"])["report_paths"]["md"] for row in rows]
+        self.assertEqual(len(set(paths)), 2)
+        for row, path in zip(rows, paths):
+            self.assertIn(f"job{row['id']}_1", path)
+
+
+class ProviderConcurrencyTest(unittest.TestCase):
+
+    def test_total_is_split_between_processes(self):
+        self.assertEqual(batch_worker.process_provider_concurrency(8, 1), 8)
+        self.assertEqual(batch_worker.process_provider_concurrency(8, 4), 2)
+        self.assertEqual(batch_worker.process_provider_concurrency(8, 3), 2)
+        self.assertEqual(batch_worker.process_provider_concurrency(2, 8), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+Testes do hedging e do prefetch especulativo (hedging.py + nós do grafo).
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["AGENT_FAKE_BACKENDS"] = "1"
+os.environ.setdefault("AGENT_FAKE_LATENCY", "0.05")
+os.environ.setdefault("AGENT_LOG_LEVEL", "WARNING")
+
+import blob_store  # noqa: E402
+import graph  # noqa: E402
+import hedging  # noqa: E402
+from scheduler import ProviderScheduler  # noqa: E402
+from schemas import ReportState  # noqa: E402
+
+# Dois relatórios concorrentes com um pool de hedge de 2 threads: antes, as
+# tarefas de prefetch ocupavam o pool e esperavam por chamadas do próprio pool
+_CONCURRENT_REPORTS = """
+import sys
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, {root!r})
+from graph import graph
+with ThreadPoolExecutor(2) as pool:
+    results = list(pool.map(graph.invoke, [
+        {{"user_input": f"tema {{i}}", "report_formats": ["md"]}} for i in range(2)]))
+print(sum(len(r["queries_results"]) for r in results))
+"""
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.report_id = f"test-{self.id()}"
+
+    def tearDown(self):
+        hedging.release(self.report_id)
+        blob_store.release(self.report_id)
+
+    def test_small_hedge_pool_does_not_deadlock(self):
+        env = dict(os.environ, AGENT_HEDGE_MAX_THREADS="2", AGENT_FAKE_ECHO_QUERY="1",
+                   AGENT_SPECULATIVE_PREFETCH="1", AGENT_HEDGE_INITIAL_DELAY="0.01")
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run(
+                [sys.executable, "-c", _CONCURRENT_REPORTS.format(root=ROOT)],
+                cwd=workdir, env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        # 4 queries por relatório (3 + user_input ecoado), 1 resultado cada
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "8")
+
+    def test_failed_prefetch_falls_back_to_search(self):
+        def failing_search(*args):
+            raise RuntimeError("falha simulada")
+
+        hedging.prefetch(self.report_id, "tema", failing_search)
+        update = graph.single_search({"query": "tema", "report_id": self.report_id,
+                                      "prefetch_key": "tema"})
+        self.assertEqual(len(update["queries_results"]), 1)
+
+    def test_unplanned_prefetch_is_discarded(self):
+        state = ReportState(report_id=self.report_id, user_input="tema livre",
+                            queries=["a", "b"], queries_results=[])
+        hedging.prefetch(self.report_id, "tema livre", lambda: {"results": []})
+        sends = graph.spawn_researchers(state)
+        self.assertEqual([send.arg["query"] for send in sends], ["a", "b"])
+        self.assertFalse(any("prefetch_key" in send.arg for send in sends))
+        self.assertFalse(hedging.has_prefetch(self.report_id, "tema livre"))
+
+    def test_planned_prefetch_is_consumed(self):
+        state = ReportState(report_id=self.report_id, user_input="Tema Livre",
+                            queries=["a", "tema  livre"], queries_results=[])
+        hedging.prefetch(self.report_id, "Tema Livre", lambda: {"results": []})
+        sends = graph.spawn_researchers(state)
+        self.assertEqual(len(sends), 2)
+        self.assertEqual(sends[1].arg["prefetch_key"], "Tema Livre")
+
+
+class HedgedCallTest(unittest.TestCase):
+    """hedged_call com uma fn controlada: cada chamada segue o roteiro da vez."""
+
+    def setUp(self):
+        self.report_id = f"test-{self.id()}"
+        self.calls = 0
+        self.unblock = threading.Event()
+        self.addCleanup(self.unblock.set)
+        patcher = mock.patch.dict(os.environ, {"AGENT_HEDGING": "1",
+                                               "AGENT_HEDGE_INITIAL_DELAY": "0.05",
+                                               "AGENT_HEDGE_MIN_SAMPLES": "1000",
+                                               "AGENT_HEDGE_BUDGET": "1"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        hedging.release(self.report_id)
+
+    def _fn(self, *scripts):
+        """Cada script é (atraso, resultado) ou (atraso, exceção); None bloqueia."""
+        lock = threading.Lock()
+
+        def fn():
+            with lock:
+                script = scripts[self.calls]
+                self.calls += 1
+            delay, outcome = script
+            if delay is None:
+                self.unblock.wait(5)
+            else:
+                time.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return fn
+
+    def _call(self, fn):
+        return hedging.hedged_call(self.id(), self.report_id, fn)
+
+    def test_slow_primary_fires_backup_and_backup_wins(self):
+        start = time.monotonic()
+        result = self._call(self._fn((None, "primária"), (0, "cópia")))
+        self.assertEqual(result, "cópia")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(hedging.stats(self.report_id), {"remaining": 0, "issued": 1, "won": 1})
+
+    def test_first_success_wins_after_hedge(self):
+        result = self._call(self._fn((0.15, "primária"), (None, "cópia")))
+        self.assertEqual(result, "primária")
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(hedging.stats(self.report_id)["won"], 0)
+
+    def test_fast_primary_does_not_hedge(self):
+        self.assertEqual(self._call(self._fn((0, "primária"))), "primária")
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(hedging.stats(self.report_id)["issued"], 0)
+
+    def test_exhausted_budget_stops_hedging(self):
+        self._call(self._fn((None, "primária"), (0, "cópia")))
+        self.calls = 0
+        result = self._call(self._fn((0.15, "segunda"), (0, "não usada")))
+        self.assertEqual(result, "segunda")
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(hedging.stats(self.report_id), {"remaining": 0, "issued": 1, "won": 1})
+
+    def test_failing_primary_falls_back_to_backup(self):
+        result = self._call(self._fn((0.1, RuntimeError("primária")), (0.2, "cópia")))
+        self.assertEqual(result, "cópia")
+        self.assertEqual(hedging.stats(self.report_id)["won"], 1)
+
+    def test_all_copies_failing_raises(self):
+        fn = self._fn((0.1, RuntimeError("primária")), (0.2, ValueError("cópia")))
+        with self.assertRaises(ValueError):
+            self._call(fn)
+
+
+class HedgeSlotTest(unittest.TestCase):
+    """Cada cópia do hedge ocupa a sua própria vaga do provedor até terminar."""
+
+    def setUp(self):
+        self.report_id = f"test-{self.id()}"
+        patcher = mock.patch.dict(os.environ, {"AGENT_HEDGING": "1",
+                                               "AGENT_HEDGE_INITIAL_DELAY": "0.05",
+                                               "AGENT_HEDGE_MIN_SAMPLES": "1000"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        hedging.release(self.report_id)
+
+    def _call(self, capacity, fn):
+        scheduler = ProviderScheduler({"tavily": capacity})
+        with mock.patch.object(hedging, "get_scheduler", return_value=scheduler):
+            result = hedging.hedged_call(self.id(), self.report_id, fn, provider="tavily")
+        return scheduler, result
+
+    def test_hedge_skipped_without_free_slot(self):
+        scheduler, result = self._call(1, lambda: time.sleep(0.2) or "ok")
+        self.assertEqual(result, "ok")
+        self.assertEqual(hedging.stats(self.report_id)["issued"], 0)
+        self.assertEqual(scheduler._in_flight["tavily"], 0)
+
+    def test_losing_copy_keeps_its_slot_until_done(self):
+        calls = []
+        slow_done = threading.Event()
+
+        def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.5)
+                slow_done.set()
+                return "lento"
+            return "rápido"
+
+        scheduler, result = self._call(2, fn)
+        self.assertEqual(result, "rápido")
+        self.assertEqual(hedging.stats(self.report_id)["won"], 1)
+        # A primeira cópia ainda está rodando e segura a vaga dela
+        self.assertEqual(scheduler._in_flight["tavily"], 1)
+        self.assertTrue(slow_done.wait(5))
+        for _ in range(100):
+            if scheduler._in_flight["tavily"] == 0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(scheduler._in_flight["tavily"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
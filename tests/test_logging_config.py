@@ -0,0 +1,108 @@
+"""
+Testes do nível e da amostragem de log por execução (logging_config.py).
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import logging
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import logging_config  # noqa: E402
+from logging_config import SamplingFilter, run_logging  # noqa: E402
+
+
+class _ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class _CountingRepr:
+    """Conta quantas vezes o argumento foi convertido em string."""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "payload"
+
+
+class RunLevelTest(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        self.addCleanup(root.setLevel, root.level)
+        patcher = mock.patch.object(logging_config, "_global_level", logging.INFO)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        logging_config._apply_root_level()
+
+        self.handler = _ListHandler()
+        self.handler.addFilter(SamplingFilter())
+        self.logger = logging.getLogger(f"test_logging_config.{self.id()}")
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def _messages(self):
+        return [record.getMessage() for record in self.handler.records]
+
+    def test_global_level_applies_without_run_override(self):
+        self.logger.debug("debug fora")
+        self.logger.info("info fora")
+        with run_logging(sample_rate=1.0):
+            self.logger.debug("debug sem nível")
+        self.assertEqual(self._messages(), ["info fora"])
+
+    def test_debug_enabled_for_a_single_run(self):
+        inside = threading.Event()
+        other_done = threading.Event()
+        payload = _CountingRepr()
+
+        def other_run():
+            # Thread novo: não herda o contexto da execução em DEBUG
+            inside.wait(5)
+            self.logger.debug("debug de outra execução: %s", payload)
+            self.logger.info("info de outra execução")
+            other_done.set()
+
+        thread = threading.Thread(target=other_run)
+        thread.start()
+        with run_logging(level="DEBUG"):
+            self.assertEqual(logging.getLogger().level, logging.DEBUG)
+            self.logger.debug("debug da execução")
+            inside.set()
+            self.assertTrue(other_done.wait(5))
+        thread.join()
+
+        self.assertEqual(logging.getLogger().level, logging.INFO)
+        self.logger.debug("debug depois")
+        self.assertEqual(self._messages(), ["debug da execução", "info de outra execução"])
+        # O registro descartado no filtro não chegou a ser formatado
+        self.assertEqual(payload.formatted, 0)
+
+    def test_root_level_follows_lowest_active_run(self):
+        root = logging.getLogger()
+        with run_logging(level="DEBUG"):
+            with run_logging(level="WARNING"):
+                self.logger.info("info em WARNING")
+                self.assertEqual(root.level, logging.DEBUG)
+            self.assertEqual(root.level, logging.DEBUG)
+        self.assertEqual(root.level, logging.INFO)
+        self.assertEqual(self._messages(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Testes do profiling por nó (profiling.py + graph.py --profile).
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class ProfileNodeTest(unittest.TestCase):
+
+    def _run_cli(self, workdir):
+        env = dict(os.environ, AGENT_FAKE_BACKENDS="1", AGENT_FAKE_LATENCY="0.05",
+                   AGENT_LOG_LEVEL="WARNING", AGENT_RENDER_ISOLATION="0")
+        result = subprocess.run([sys.executable, os.path.join(ROOT, "graph.py"), "--profile"],
+                                cwd=workdir, env=env, input="tema\n", capture_output=True,
+                                text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        return os.path.join(workdir, "reports", "profiles")
+
+    def test_cli_run_writes_one_directory(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            profiles = self._run_cli(workdir)
+            runs = os.listdir(profiles)
+            self.assertEqual(len(runs), 1)
+            self.assertNotEqual(runs[0], "sem_relatorio")
+            files = os.listdir(os.path.join(profiles, runs[0]))
+
+        nodes = {name.rsplit("_", 1)[0] for name in files}
+        self.assertEqual(nodes, {"build_first_queries", "single_search", "final_writer"})
+        collapsed = [name for name in files if name.endswith(".collapsed")]
+        self.assertEqual(len(collapsed), 5)  # 1 + 3 buscas paralelas + 1
+        pstats = {name.rsplit("_", 1)[0] for name in files if name.endswith(".pstats")}
+        self.assertIn("build_first_queries", pstats)
+        self.assertIn("final_writer", pstats)
+        if sys.version_info >= (3, 12):
+            # Ramos paralelos se sobrepõem: o cProfile do processo não é de um nó só
+            self.assertNotIn("single_search", pstats)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Testes do layout dos prompts para o cache de prompt do provedor (prompt.py).
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("AGENT_LOG_LEVEL", "WARNING")
+
+import prompt  # noqa: E402
+import token_usage  # noqa: E402
+from fake_backends import FakeChatModel  # noqa: E402
+
+_TEMPLATES = {
+    "build_queries": {"user_input": "tema"},
+    "resume_search": {"user_input": "tema", "search_results": "conteúdo"},
+    "build_final_response": {"user_input": "tema", "search_results": "conteúdo"},
+}
+
+
+class PromptLayoutTest(unittest.TestCase):
+
+    def test_variable_parts_come_last(self):
+        for name, fields in _TEMPLATES.items():
+            template = getattr(prompt, name)
+            self.assertTrue(template.startswith(prompt.agent_prompt), name)
+            # Nada de estático depois do primeiro campo variável
+            static = template[:template.index("{")]
+            self.assertNotIn("{", static)
+            filled = [template.format(**dict.fromkeys(fields, value)) for value in ("a", "b")]
+            self.assertTrue(filled[1].startswith(static), name)
+            self.assertTrue(filled[0].rstrip().endswith(">"), name)
+
+
+class CachedTokensTest(unittest.TestCase):
+
+    def test_cached_prefix_is_recorded(self):
+        # Prefixo acima do limite de 1024 tokens do provedor (~4 caracteres por token)
+        llm = FakeChatModel(latency=0)
+        prefix = "instrução estática " * 400
+        report_id = f"test-{self.id()}"
+        try:
+            for suffix in ("a", "b"):
+                token_usage.record_usage(report_id, "resume_search",
+                                         llm.invoke(prefix + suffix))
+            usage = token_usage.usage_summary(report_id)["resume_search"]
+        finally:
+            token_usage.release(report_id)
+        self.assertEqual(usage["calls"], 2)
+        self.assertGreaterEqual(usage["cached_input_tokens"], 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+"""
+Testes do pool de renderização em subprocessos (render_pool.py).
+
+O teste de soak renderiza milhares de relatórios sintéticos e exige o
+WeasyPrint instalado (com Pango); sem ele, é pulado. A quantidade de
+relatórios pode ser ajustada com AGENT_RENDER_SOAK_REPORTS.
+
+Uso:
+    python -m unittest discover -s tests
+    AGENT_RENDER_SOAK_REPORTS=10000 python -m unittest tests.test_render_pool
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("AGENT_LOG_LEVEL", "WARNING")
+
+import render_pool  # noqa: E402
+from pdf_generator import render_html  # noqa: E402
+
+
+def _weasyprint_available() -> bool:
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def _synthetic_report(i: int) -> str:
+    sections = "".join(
+        f"### Subtópico {j}\n\n" + f"Parágrafo {i}.{j} com **dados** e citações [{j}]. " * (j * 5)
+        + "\n\n- item a\n- item b\n\n"
+        for j in range(1, 2 + i % 4))
+    return (f"# Relatório sintético {i}\n\n## Resumo Executivo\n\nResumo do relatório {i}.\n\n"
+            f"## Principais Descobertas\n\n{sections}\n\n References:\n"
+            f"[1] - [Fonte](https://example.com/{i})\n")
+
+
+# Simula uma biblioteca que escreve direto no fd 1, como o Pango/fontconfig
+_NOISY_WEASYPRINT = """
+import os
+os.write(1, b"aviso na importacao\\n")
+
+class HTML:
+    def __init__(self, string=None, **kwargs):
+        self.string = string
+
+    def write_pdf(self, target=None, **kwargs):
+        os.write(1, b"aviso na renderizacao\\n")
+        return b"%PDF-1.7 " + self.string.encode()[:32]
+"""
+
+# Simula o acúmulo de memória do WeasyPrint: cada renderização retém LEAK_MB
+_LEAKY_WEASYPRINT = """
+_retained = []
+
+class HTML:
+    def __init__(self, string=None, **kwargs):
+        self.string = string
+
+    def write_pdf(self, target=None, **kwargs):
+        _retained.append(b"x" * (%d * 1024 * 1024))
+        return b"%%PDF-1.7"
+"""
+LEAK_MB = 8
+
+
+def _fake_weasyprint(workdir: str, source: str):
+    """Grava um weasyprint.py falso em workdir e o coloca no PYTHONPATH dos filhos."""
+    with open(os.path.join(workdir, "weasyprint.py"), "w", encoding="utf-8") as f:
+        f.write(source)
+    pythonpath = os.pathsep.join(filter(None, [workdir, os.getenv("PYTHONPATH")]))
+    return mock.patch.dict(os.environ, {"PYTHONPATH": pythonpath})
+
+
+def _record_child_rss(pool: render_pool.RenderPool) -> list:
+    """Registra o RSS reportado pelo filho em cada job, antes de uma eventual reciclagem."""
+    seen = []
+    release = pool._release
+
+    def record(worker, healthy):
+        seen.append(worker.rss_mb)
+        release(worker, healthy)
+
+    pool._release = record
+    return seen
+
+
+class RenderPoolProtocolTest(unittest.TestCase):
+
+    def test_native_stdout_writes_do_not_corrupt_protocol(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            with _fake_weasyprint(workdir, _NOISY_WEASYPRINT):
+                pool = render_pool.RenderPool(size=1, max_jobs=2, timeout=30)
+                try:
+                    for i in range(3):
+                        path = os.path.join(workdir, f"r{i}.pdf")
+                        pool.render(f"<p>{i}</p>", path)
+                        with open(path, "rb") as f:
+                            self.assertTrue(f.read().startswith(b"%PDF"))
+                finally:
+                    pool.close()
+        self.assertEqual(pool.recycled, 1)
+
+    def test_child_recycled_by_rss(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            with _fake_weasyprint(workdir, _LEAKY_WEASYPRINT % LEAK_MB):
+                pool = render_pool.RenderPool(size=1, max_jobs=1000, timeout=30)
+                seen = _record_child_rss(pool)
+                try:
+                    path = os.path.join(workdir, "r.pdf")
+                    pool.render("<p>0</p>", path)
+                    pool.max_rss_mb = seen[0] + 3 * LEAK_MB
+                    for i in range(20):
+                        pool.render(f"<p>{i}</p>", path)
+                finally:
+                    pool.close()
+        self.assertGreaterEqual(pool.recycled_rss, 3)
+        self.assertEqual(pool.recycled, pool.recycled_rss)
+        # Um filho só passa do limite pelo que o último job reteve
+        self.assertLessEqual(max(seen), pool.max_rss_mb + LEAK_MB + 2)
+
+
+@unittest.skipUnless(_weasyprint_available(), "WeasyPrint indisponível")
+class RenderPoolSoakTest(unittest.TestCase):
+
+    def test_parent_and_child_rss_bounded_and_children_recycled(self):
+        reports = int(os.getenv("AGENT_RENDER_SOAK_REPORTS", "2000"))
+        max_jobs = 200
+        # Margem de um job: o RSS reportado pode passar do limite pelo que o
+        # último relatório acumulou antes da reciclagem
+        job_margin_mb = 50
+        pool = render_pool.RenderPool(size=2, max_jobs=max_jobs, timeout=60)
+        seen = _record_child_rss(pool)
+        pids = set()
+        with tempfile.TemporaryDirectory() as workdir:
+            try:
+                # Aquecimento: o RSS de referência já inclui os imports e o primeiro filho
+                pool.render(render_html(_synthetic_report(0)), os.path.join(workdir, "w.pdf"))
+                baseline = render_pool.current_rss_mb()
+                # Limite baixo o bastante para que o acúmulo dos caches force
+                # reciclagens por RSS antes do limite de jobs
+                pool.max_rss_mb = seen[0] + 10
+                peak = baseline
+                for i in range(reports):
+                    path = os.path.join(workdir, f"r{i % 10}.pdf")
+                    pool.render(render_html(_synthetic_report(i)), path)
+                    pids.update(worker.process.pid for worker in pool._workers)
+                    if i % 100 == 0:
+                        peak = max(peak, render_pool.current_rss_mb())
+                peak = max(peak, render_pool.current_rss_mb())
+            finally:
+                pool.close()
+
+        self.assertLess(peak - baseline, 50, f"RSS do pai cresceu {peak - baseline:.1f} MB")
+        self.assertLessEqual(max(seen), pool.max_rss_mb + job_margin_mb,
+                             f"RSS de um filho chegou a {max(seen):.1f} MB")
+        self.assertGreater(pool.recycled_rss, 0)
+        self.assertGreaterEqual(pool.recycled, reports // max_jobs - 1)
+        self.assertGreater(len(pids), reports // max_jobs)
+
+
+if __name__ == "__main__":
+    unittest.main()
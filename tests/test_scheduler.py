@@ -0,0 +1,196 @@
+"""
+Testes do escalonador de provedores (scheduler.py).
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from scheduler import BATCH, INTERACTIVE, ProviderScheduler, job_context  # noqa: E402
+
+
+class _Gate:
+    """Ocupa as vagas de um provedor até ser aberto."""
+
+    def __init__(self, scheduler, provider="openai", count=1):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.threads = [threading.Thread(target=self._hold, args=(scheduler, provider, i))
+                        for i in range(count)]
+        for thread in self.threads:
+            thread.start()
+        for _ in range(count):
+            assert self.started.acquire(timeout=5)
+
+    def _hold(self, scheduler, provider, i):
+        with job_context(f"gate{i}", tenant="gate"):
+            scheduler.call(provider, lambda: (self.started.release(), self.release.wait()))
+
+    def open(self):
+        self.release.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+
+def _queue_calls(scheduler, calls, order, provider="openai"):
+    """Enfileira as chamadas (job_id, tenant, classe, peso) na ordem dada."""
+    threads = []
+    for job_id, tenant, priority_class, weight in calls:
+        def call(job_id=job_id, tenant=tenant, priority_class=priority_class, weight=weight):
+            with job_context(job_id, tenant=tenant, priority_class=priority_class,
+                             weight=weight):
+                scheduler.call(provider, order.append, job_id)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        threads.append(thread)
+        # Garante a ordem de chegada na fila
+        _wait_queued(scheduler, provider, len(threads))
+    return threads
+
+
+def _wait_queued(scheduler, provider, count):
+    for _ in range(500):
+        with scheduler._cond:
+            if len(scheduler._waiting[provider]) >= count:
+                return
+        threading.Event().wait(0.01)
+    raise AssertionError("chamadas não chegaram à fila")
+
+
+class OrderingTest(unittest.TestCase):
+
+    def test_interactive_runs_before_batch(self):
+        scheduler = ProviderScheduler({"openai": 1})
+        gate = _Gate(scheduler)
+        order = []
+        threads = _queue_calls(scheduler, [
+            ("lote1", "lote", BATCH, 1.0),
+            ("lote2", "lote", BATCH, 1.0),
+            ("interativo", "web", INTERACTIVE, 1.0),
+        ], order)
+        gate.open()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(order, ["interativo", "lote1", "lote2"])
+
+    def test_weights_split_slots_between_tenants(self):
+        scheduler = ProviderScheduler({"openai": 1}, job_concurrency=100)
+        gate = _Gate(scheduler)
+        order = []
+        calls = []
+        for i in range(6):
+            calls.append((f"a{i}", "a", INTERACTIVE, 2.0))
+            calls.append((f"b{i}", "b", INTERACTIVE, 1.0))
+        threads = _queue_calls(scheduler, calls, order)
+        gate.open()
+        for thread in threads:
+            thread.join(timeout=5)
+        # Peso 2 contra peso 1: o tenant "a" recebe 2 vagas para cada 1 de "b"
+        first = [job_id[0] for job_id in order[:9]]
+        self.assertEqual(first.count("a"), 6)
+        self.assertEqual(first.count("b"), 3)
+
+    def test_job_cap_limits_fan_out(self):
+        scheduler = ProviderScheduler({"openai": 4}, job_concurrency=2)
+        release = threading.Event()
+        running = []
+        lock = threading.Lock()
+        peak = {"job": 0}
+
+        def call():
+            with job_context("job"):
+                def work():
+                    with lock:
+                        running.append(1)
+                        peak["job"] = max(peak["job"], len(running))
+                    release.wait()
+                    with lock:
+                        running.pop()
+                scheduler.call("openai", work)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        _wait_queued(scheduler, "openai", 2)
+        # Outro job ainda encontra vaga, apesar das chamadas do primeiro na fila
+        with job_context("outro"):
+            self.assertEqual(scheduler.call("openai", lambda: "ok"), "ok")
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(peak["job"], 2)
+
+
+class TryAcquireTest(unittest.TestCase):
+
+    def test_only_free_slots_without_queue(self):
+        scheduler = ProviderScheduler({"openai": 1})
+        with job_context("job"):
+            job = scheduler.try_acquire("openai")
+            self.assertIsNotNone(job)
+            self.assertIsNone(scheduler.try_acquire("openai"))
+            scheduler.release("openai", job)
+            self.assertIsNotNone(scheduler.try_acquire("openai"))
+
+    def test_does_not_jump_the_queue(self):
+        scheduler = ProviderScheduler({"openai": 2}, job_concurrency=1)
+        gate = _Gate(scheduler)
+        order = []
+        # gate0 já está no limite por job: a nova chamada dele fica na fila
+        # mesmo com uma vaga livre, e o try_acquire não passa à frente dela
+        threads = _queue_calls(scheduler, [("gate0", "gate", INTERACTIVE, 1.0)], order)
+        with job_context("hedge"):
+            self.assertIsNone(scheduler.try_acquire("openai"))
+        gate.open()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(order, ["gate0"])
+
+
+class ReservedSlotsTest(unittest.TestCase):
+
+    def _start_batch_calls(self, scheduler, count, release):
+        started = threading.Semaphore(0)
+
+        def call(i):
+            with job_context(f"lote{i}", tenant="lote", priority_class=BATCH):
+                scheduler.call("openai", lambda: (started.release(), release.wait()))
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, started
+
+    def test_batch_cannot_take_reserved_slots(self):
+        scheduler = ProviderScheduler({"openai": 3}, reserved_interactive=1)
+        release = threading.Event()
+        threads, started = self._start_batch_calls(scheduler, 3, release)
+        try:
+            for _ in range(2):
+                self.assertTrue(started.acquire(timeout=5))
+            # A terceira chamada em lote fica na fila; a interativa usa a vaga reservada
+            self.assertFalse(started.acquire(timeout=0.2))
+            with job_context("interativo"):
+                self.assertEqual(scheduler.call("openai", lambda: "ok"), "ok")
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join(timeout=5)
+        self.assertTrue(started.acquire(timeout=5))
+
+    def test_single_slot_still_serves_batch(self):
+        scheduler = ProviderScheduler({"openai": 1}, reserved_interactive=4)
+        with job_context("lote", priority_class=BATCH):
+            self.assertEqual(scheduler.call("openai", lambda: "ok"), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
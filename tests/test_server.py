@@ -0,0 +1,191 @@
+"""
+Teste de carga do servidor HTTP (server.py), totalmente offline.
+
+Sobe o ResearchServer com os backends falsos (AGENT_FAKE_BACKENDS=1) e
+submete jobs concorrentes por HTTP real: fila cheia (202/503), ordem dos
+eventos SSE e download dos relatórios.
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["AGENT_FAKE_BACKENDS"] = "1"
+os.environ.setdefault("AGENT_FAKE_LATENCY", "0.05")
+os.environ.setdefault("AGENT_LOG_LEVEL", "WARNING")
+os.environ["AGENT_RENDER_ISOLATION"] = "0"
+
+import blob_store  # noqa: E402
+import pdf_generator  # noqa: E402
+from graph import graph  # noqa: E402
+from server import ResearchServer  # noqa: E402
+
+
+async def _request(port: int, method: str, path: str, body: dict = None):
+    """Faz uma requisição HTTP/1.1 e retorna (status, headers, corpo)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(lines[0].split()[1]), headers, payload
+
+
+def _parse_sse(payload: bytes) -> list:
+    events = []
+    for block in payload.decode("utf-8").split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class ServerLoadTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # Relatórios gravados em um diretório temporário
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        self.server = None
+
+    async def asyncTearDown(self):
+        if self.server is not None:
+            await self.server.stop()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    async def _start(self, workers: int, queue_size: int) -> int:
+        self.server = ResearchServer(graph, workers=workers, queue_size=queue_size)
+        listener = await self.server.start("127.0.0.1", 0)
+        return listener.sockets[0].getsockname()[1]
+
+    async def _wait_finished(self, timeout: float = 60):
+        async with asyncio.timeout(timeout):
+            while not all(job.finished for job in self.server.jobs.values()):
+                await asyncio.sleep(0.05)
+
+    async def test_concurrent_submissions_fill_queue(self):
+        workers, queue_size, submissions = 1, 4, 12
+        port = await self._start(workers, queue_size)
+
+        responses = await asyncio.gather(*[
+            _request(port, "POST", "/jobs", {"user_input": f"tema {i}", "formats": ["md"]})
+            for i in range(submissions)])
+        statuses = [status for status, _, _ in responses]
+
+        self.assertTrue(set(statuses) <= {202, 503}, statuses)
+        accepted = statuses.count(202)
+        # Cabem queue_size na fila mais, no máximo, um job já retirado por worker
+        self.assertGreaterEqual(accepted, queue_size)
+        self.assertLessEqual(accepted, queue_size + workers)
+        self.assertEqual(statuses.count(503), submissions - accepted)
+
+        await self._wait_finished()
+        self.assertEqual(len(self.server.jobs), accepted)
+        self.assertTrue(all(job.status == "done" for job in self.server.jobs.values()))
+        self.assertEqual(blob_store.stats()["blobs"], 0)
+
+    async def test_sse_event_order_and_report_download(self):
+        port = await self._start(workers=1, queue_size=8)
+
+        # Um job na frente mantém o job observado na fila até o SSE conectar,
+        # para que os tokens (transmitidos só ao vivo) sejam recebidos
+        await _request(port, "POST", "/jobs", {"user_input": "na frente", "formats": ["md"]})
+        status, _, payload = await _request(port, "POST", "/jobs", {
+            "user_input": "eventos", "formats": ["md", "html"]})
+        self.assertEqual(status, 202)
+        job_id = json.loads(payload)["job_id"]
+
+        status, headers, payload = await _request(port, "GET", f"/jobs/{job_id}/events")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-type"], "text/event-stream")
+        events = _parse_sse(payload)
+
+        self.assertEqual(events[0], ("status", {"status": "running"}))
+        self.assertEqual(events[-1][0], "status")
+        self.assertEqual(events[-1][1]["status"], "done")
+        nodes = [data["node"] for event, data in events if event == "node"]
+        self.assertEqual(nodes[0], "build_first_queries")
+        self.assertEqual(nodes[-1], "final_writer")
+        self.assertIn("single_search", nodes)
+        # Tokens do final_writer chegam antes da conclusão do nó
+        token_positions = [i for i, (event, data) in enumerate(events)
+                           if event == "token" and data["node"] == "final_writer"]
+        self.assertTrue(token_positions)
+        final_node = max(i for i, (event, data) in enumerate(events)
+                         if event == "node" and data["node"] == "final_writer")
+        self.assertLess(max(token_positions), final_node)
+
+        status, headers, payload = await _request(port, "GET", f"/jobs/{job_id}/report.md")
+        self.assertEqual(status, 200)
+        self.assertTrue(headers["content-type"].startswith("text/markdown"))
+        self.assertIn(b"References:", payload)
+
+        status, headers, payload = await _request(port, "GET", f"/jobs/{job_id}/report.html")
+        self.assertEqual(status, 200)
+        self.assertTrue(headers["content-type"].startswith("text/html"))
+        self.assertIn(b"<html", payload)
+
+        # PDF não foi pedido
+        status, _, _ = await _request(port, "GET", f"/jobs/{job_id}/report.pdf")
+        self.assertEqual(status, 404)
+
+    async def test_failed_format_reports_cause(self):
+        port = await self._start(workers=1, queue_size=2)
+
+        def failing_pdf(html_content, pdf_path):
+            raise RuntimeError("falha simulada")
+
+        with mock.patch.object(pdf_generator, "_write_pdf", failing_pdf):
+            status, _, payload = await _request(port, "POST", "/jobs", {
+                "user_input": "pdf quebrado", "formats": ["pdf", "md"]})
+            self.assertEqual(status, 202)
+            job_id = json.loads(payload)["job_id"]
+            _, _, payload = await _request(port, "GET", f"/jobs/{job_id}/events")
+
+        cause = "RuntimeError: falha simulada"
+        final = _parse_sse(payload)[-1]
+        self.assertEqual(final[1]["status"], "done")
+        self.assertEqual(final[1]["report_errors"], {"pdf": cause})
+        _, _, payload = await _request(port, "GET", f"/jobs/{job_id}")
+        self.assertEqual(json.loads(payload)["report_errors"], {"pdf": cause})
+        status, _, payload = await _request(port, "GET", f"/jobs/{job_id}/report.pdf")
+        self.assertEqual(status, 404)
+        self.assertEqual(json.loads(payload)["cause"], cause)
+        status, _, _ = await _request(port, "GET", f"/jobs/{job_id}/report.md")
+        self.assertEqual(status, 200)
+
+    async def test_invalid_submission_rejected(self):
+        port = await self._start(workers=1, queue_size=2)
+        status, _, _ = await _request(port, "POST", "/jobs", {"user_input": ""})
+        self.assertEqual(status, 400)
+        status, _, _ = await _request(port, "POST", "/jobs",
+                                      {"user_input": "x", "formats": ["docx"]})
+        self.assertEqual(status, 400)
+        for sample_rate in (-0.1, 1.5, True, "0.5"):
+            status, _, _ = await _request(port, "POST", "/jobs",
+                                          {"user_input": "x", "log_sample_rate": sample_rate})
+            self.assertEqual(status, 400, sample_rate)
+        self.assertEqual(self.server.jobs, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Contabilização de tokens por chamada de LLM, incluindo tokens em cache.
+
+Lê o usage_metadata das respostas (AIMessage) e acumula, por relatório e
+por tipo de chamada, os tokens de entrada, de saída e os tokens de entrada
+servidos pelo cache de prompt do provedor (input_token_details.cache_read).
+"""
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_usage = {}
+_lock = threading.Lock()
+
+
+def _empty() -> dict:
+    return {"calls": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+
+
+def record_usage(report_id: str, call: str, message) -> dict:
+    """
+    Registra o uso de tokens de uma resposta de LLM.
+
+    Args:
+        report_id (str): Relatório ao qual a chamada pertence
+        call (str): Tipo de chamada (ex.: "build_queries", "resume_search")
+        message: Resposta do LLM (AIMessage); sem usage_metadata, nada é contado
+
+    Returns:
+        dict: Uso desta chamada (input_tokens, cached_input_tokens, output_tokens)
+    """
+    metadata = getattr(message, "usage_metadata", None) or {}
+    details = metadata.get("input_token_details") or {}
+    usage = {
+        "input_tokens": metadata.get("input_tokens", 0),
+        "cached_input_tokens": details.get("cache_read", 0) or 0,
+        "output_tokens": metadata.get("output_tokens", 0),
+    }
+
+    with _lock:
+        per_call = _usage.setdefault(report_id, {})
+        totals = per_call.setdefault(call, _empty())
+        totals["calls"] += 1
+        for key, value in usage.items():
+            totals[key] += value
+
+    logger.info("🧮 %s: %s tokens de entrada (%s em cache), %s de saída",
+                call, usage["input_tokens"], usage["cached_input_tokens"],
+                usage["output_tokens"])
+    return usage
+
+
+def usage_summary(report_id: str) -> dict:
+    """
+    Retorna o uso acumulado do relatório, por tipo de chamada e total.
+
+    Returns:
+        dict: {"<call>": {...}, ..., "total": {...}}
+    """
+    with _lock:
+        per_call = {call: dict(totals) for call, totals in _usage.get(report_id, {}).items()}
+    total = _empty()
+    for totals in per_call.values():
+        for key in total:
+            total[key] += totals[key]
+    per_call["total"] = total
+    return per_call
+
+
+def release(report_id: str) -> None:
+    """Descarta o uso acumulado do relatório."""
+    with _lock:
+        _usage.pop(report_id, None)